@@ -0,0 +1,27 @@
+"""add hints coordinate indexes
+
+Revision ID: 3f1c2a9b7d4e
+Revises:
+Create Date: 2026-10-17 10:12:43.518204
+
+"""
+
+from typing import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9b7d4e'
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_hints_posY_posX', 'hints', ['posY', 'posX'], unique=False, if_not_exists=True)
+    op.create_index('ix_hints_posX_posY', 'hints', ['posX', 'posY'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_hints_posX_posY', table_name='hints', if_exists=True)
+    op.drop_index('ix_hints_posY_posX', table_name='hints', if_exists=True)
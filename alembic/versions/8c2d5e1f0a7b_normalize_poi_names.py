@@ -0,0 +1,66 @@
+"""normalize poi names
+
+Revision ID: 8c2d5e1f0a7b
+Revises: 3f1c2a9b7d4e
+Create Date: 2026-10-17 23:31:05.227913
+
+"""
+
+from typing import Sequence
+
+import sqlalchemy as sa
+import sqlmodel
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2d5e1f0a7b'
+down_revision: str | None = '3f1c2a9b7d4e'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+LANGUAGES = ('fr', 'en', 'es', 'de', 'pt')
+
+
+def upgrade() -> None:
+    # create_db_and_tables runs at startup, so part of this may already be in place
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('poi'):
+        op.create_table(
+            'poi',
+            sa.Column('id', sa.Integer(), nullable=False),
+            *(sa.Column(f'name_{lang}', sqlmodel.sql.sqltypes.AutoString(), nullable=False) for lang in LANGUAGES),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    columns = {column['name'] for column in inspector.get_columns('hints')}
+    if 'poi_id' not in columns:
+        op.add_column('hints', sa.Column('poi_id', sa.Integer(), nullable=True))
+    if {f'hint_{lang}' for lang in LANGUAGES} <= columns:
+        # Fixture POI ids are not stored in hints, existing rows get one POI per distinct set of translations
+        # until the next `seed --hints`
+        hint_names = ', '.join(f'hint_{lang}' for lang in LANGUAGES)
+        poi_names = ', '.join(f'name_{lang}' for lang in LANGUAGES)
+        op.execute(
+            f'INSERT INTO poi (id, {poi_names}) '
+            f'SELECT row_number() OVER (ORDER BY min(id)), {hint_names} FROM hints GROUP BY {hint_names}'
+        )
+        op.execute(f'UPDATE hints SET poi_id = poi.id FROM poi WHERE ({hint_names}) = ({poi_names})')
+        for lang in LANGUAGES:
+            op.drop_column('hints', f'hint_{lang}')
+    op.alter_column('hints', 'poi_id', nullable=False)
+    if not any(fk['referred_table'] == 'poi' for fk in inspector.get_foreign_keys('hints')):
+        op.create_foreign_key('hints_poi_id_fkey', 'hints', 'poi', ['poi_id'], ['id'])
+    op.create_index('ix_hints_poi_id', 'hints', ['poi_id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for lang in LANGUAGES:
+        op.add_column('hints', sa.Column(f'hint_{lang}', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    assignments = ', '.join(f'hint_{lang} = poi.name_{lang}' for lang in LANGUAGES)
+    op.execute(f'UPDATE hints SET {assignments} FROM poi WHERE hints.poi_id = poi.id')
+    for lang in LANGUAGES:
+        op.alter_column('hints', f'hint_{lang}', nullable=False)
+    op.drop_index('ix_hints_poi_id', table_name='hints')
+    op.drop_constraint('hints_poi_id_fkey', 'hints', type_='foreignkey')
+    op.drop_column('hints', 'poi_id')
+    op.drop_table('poi')
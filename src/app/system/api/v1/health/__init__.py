@@ -0,0 +1,7 @@
+from fastapi import APIRouter
+
+from src.app.system.api.v1.health.health import router as health_router
+
+router = APIRouter(prefix='/health')
+
+router.include_router(health_router, tags=['Health'])
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Request
+
+from src.common.exception import errors
+from src.common.response.response_schema import ResponseModel, response_base
+from src.common.security.jwt import decoded_token_cache, password_executor, token_user_cache
+
+router = APIRouter()
+
+
+@router.get('/live', summary='Liveness probe')
+async def live() -> ResponseModel:
+    return response_base.success()
+
+
+@router.get(
+    '/ready',
+    summary='Readiness probe',
+    description='503 until the worker has finished warming up, see WARMUP_* settings',
+)
+async def ready(request: Request) -> ResponseModel:
+    if not getattr(request.app.state, 'ready', False):
+        raise errors.HTTPError(code=503, msg='Warming up')
+    return response_base.success()
+
+
+@router.get(
+    '/metrics',
+    summary='Worker metrics',
+    description='In-process counters of the worker answering the request, since its startup',
+)
+async def metrics() -> ResponseModel[dict[str, dict[str, int | float]]]:
+    data = {
+        'password_hash': password_executor.stats(),
+        'token_decode_cache': decoded_token_cache.stats(),
+        'token_user_cache': token_user_cache.stats(),
+    }
+    return response_base.success(data=data)
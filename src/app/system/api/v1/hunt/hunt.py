@@ -1,22 +1,152 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+from typing import Annotated
 
-from src.app.system.models.hints import Hint
+from fastapi import APIRouter, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+from src.app.system.schema.hints import HintDetail, HintNearestRequest, HintRequest, HintResult
+from src.app.system.schema.poi import GetPoiSearchDetail, PoiSearchRequest
 from src.app.system.service.hunt_service import HuntService
-from src.common.enums import DirectionType
+from src.common.enums import LanguageType
 from src.common.response.response_schema import ResponseModel, response_base
 from src.common.security.jwt import DependsJwtAuth
+from src.core.conf import settings
+from src.utils.http_cache import etag_matches, not_modified
 
 router = APIRouter()
 
 
-class HintRequest(BaseModel):
-    x: int
-    y: int
-    direction: DirectionType
+@router.post('/hints', summary='Get hints', dependencies=[DependsJwtAuth])
+async def get_hints(request: HintRequest) -> ResponseModel[HintResult]:
+    answer = HuntService.get_answer(request)
+    if answer is not None:
+        return response_base.raw_success(data=answer)
+    hints = await HuntService.get_hints(request)
+    return response_base.success(data=hints)
 
 
-@router.post('/hints', summary='Get hints', dependencies=[DependsJwtAuth])
-async def get_hints(request: HintRequest) -> ResponseModel[list[Hint]]:
-    hints = await HuntService.get_hints(x=request.x, y=request.y, direction=request.direction)
-    return response_base.success(data=list(hints))
+@router.get(
+    '/hints',
+    summary='Get hints with HTTP caching',
+    description='Same lookup as POST /hints, answered with ETag and Cache-Control headers and 304 on If-None-Match',
+    dependencies=[DependsJwtAuth],
+)
+async def query_hints(
+    request: Request, response: Response, params: Annotated[HintRequest, Query()]
+) -> ResponseModel[HintResult]:
+    etag = await HuntService.get_hints_etag(params)
+    headers = {'ETag': etag, 'Cache-Control': settings.HUNT_HINTS_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return not_modified(headers)
+    answer = HuntService.get_answer(params)
+    if answer is not None:
+        raw_response = response_base.raw_success(data=answer)
+        raw_response.headers.update(headers)
+        return raw_response
+    response.headers.update(headers)
+    hints = await HuntService.get_hints(params)
+    return response_base.success(data=hints)
+
+
+@router.post(
+    '/hints/batch',
+    summary='Get hints in batch',
+    description='Answer several lookups in one request, results are returned in request order',
+    dependencies=[DependsJwtAuth],
+)
+async def get_hints_batch(requests: list[HintRequest]) -> ResponseModel[list[HintResult]]:
+    hints = await HuntService.get_hints_batch(requests=requests)
+    return response_base.success(data=hints)
+
+
+@router.post(
+    '/hints/nearest',
+    summary='Get the nearest hint for a POI',
+    description='First hint for a POI, by id or name, in the given direction at any distance, null when there is none',
+    dependencies=[DependsJwtAuth],
+)
+async def get_nearest_hint(request: HintNearestRequest) -> ResponseModel[HintDetail | None]:
+    hint = await HuntService.get_nearest_hint(request)
+    return response_base.success(data=hint)
+
+
+@router.get(
+    '/pois',
+    summary='Get the POI catalogue',
+    description='Names of every POI in a language keyed by POI id, to resolve compact hint responses',
+    dependencies=[DependsJwtAuth],
+)
+async def get_pois(request: Request, lang: Annotated[LanguageType, Query()]) -> ResponseModel[dict[int, str]]:
+    etag = await HuntService.get_pois_etag(lang)
+    headers = {'ETag': etag, 'Cache-Control': settings.HUNT_POIS_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return not_modified(headers)
+    pois = await HuntService.get_pois(lang)
+    raw_response = response_base.raw_success(data=pois)
+    raw_response.headers.update(headers)
+    return raw_response
+
+
+@router.get(
+    '/search',
+    summary='Search POIs',
+    description='Fuzzy, accent-insensitive search of POI names in every language, ranked by trigram similarity',
+    dependencies=[DependsJwtAuth],
+)
+async def search_pois(params: Annotated[PoiSearchRequest, Query()]) -> ResponseModel[list[GetPoiSearchDetail]]:
+    pois = await HuntService.search_pois(params)
+    return response_base.success(data=pois)
+
+
+@router.get(
+    '/hints/export',
+    summary='Export all hints',
+    description='Stream the complete hint map as NDJSON, one hint per line, optionally gzip-compressed',
+    dependencies=[DependsJwtAuth],
+)
+async def export_hints(
+    lang: Annotated[LanguageType | None, Query()] = None,
+    gzip: Annotated[bool, Query()] = False,
+) -> StreamingResponse:
+    # A gzip file download rather than a Content-Encoding, which clients would transparently decode
+    filename, media_type = ('hints.ndjson.gz', 'application/gzip') if gzip else ('hints.ndjson', 'application/x-ndjson')
+    return StreamingResponse(
+        HuntService.export_hints(lang=lang, compress=gzip),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+
+# Tile coordinates whose cells still fit in a 32-bit integer
+TileCoordinate = Annotated[int, Path(ge=-(2**31) // settings.HUNT_TILE_SIZE, lt=(2**31 - 1) // settings.HUNT_TILE_SIZE)]
+
+
+@router.get(
+    '/tiles/{tx}/{ty}',
+    summary='Get a hint tile',
+    description=(
+        'All hints of a fixed-size tile in a compact binary encoding with delta-coded coordinates and '
+        'dictionary-coded POI names, see src/common/hint_tile.py for the layout'
+    ),
+    dependencies=[DependsJwtAuth],
+)
+async def get_tile(request: Request, tx: TileCoordinate, ty: TileCoordinate) -> Response:
+    etag = await HuntService.get_tile_etag(tx=tx, ty=ty)
+    headers = {'ETag': etag, 'Cache-Control': settings.HUNT_HINTS_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return not_modified(headers)
+    tile = await HuntService.get_tile(tx=tx, ty=ty)
+    return Response(content=tile, media_type='application/octet-stream', headers=headers)
+
+
+@router.post(
+    '/reload',
+    summary='Reload hints dataset',
+    description=(
+        'Bump the dataset version and tell every worker to rebuild its hint index in the background, '
+        'lookups keep being served from the previous index until the swap'
+    ),
+    dependencies=[DependsJwtAuth],
+)
+async def reload_dataset(request: Request) -> ResponseModel[int]:
+    version = await HuntService.reload_dataset(request)
+    return response_base.success(data=version)
@@ -1,46 +1,383 @@
-from typing import Sequence
+from typing import Any, AsyncIterator, Sequence
 
+from sqlalchemy import ColumnElement, Integer, Row, String, and_, column, func, or_, text, values
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import Select
 
 from src.app.system.crud.base import CRUDBase
 from src.app.system.models.hints import Hint
+from src.app.system.models.poi import Poi
 from src.app.system.schema.hints import HintCreate, HintUpdate
-from src.common.enums import DirectionType
+from src.common.enums import DirectionType, LanguageType
+from src.common.hint_index import HINT_NAME_FIELDS, poi_key
+from src.common.hint_occupancy import HintOccupancy
+
+# Session-local tables `seed --hints` copies the fixture into before merging it
+POI_STAGING = f'{Poi.__tablename__}_staging'
+POI_STAGING_COLUMNS = ('id', 'name_fr', 'name_en', 'name_es', 'name_de', 'name_pt')
+HINTS_STAGING = f'{Hint.__tablename__}_staging'
+HINTS_STAGING_COLUMNS = ('id', 'posX', 'posY', 'poi_id')
 
 
 class CRUDHints(CRUDBase[Hint, HintCreate, HintUpdate]):
-    async def get_by_direction(self, db: AsyncSession, direction: DirectionType, x: int, y: int) -> Sequence[Hint]:
+    # Occupied rows and columns of the table, lookups that cannot find hints skip the query when set
+    occupancy: HintOccupancy | None = None
+
+    async def get_by_direction(
+        self, db: AsyncSession, direction: DirectionType, x: int, y: int, distance: int = 10
+    ) -> Sequence[Row]:
+        if not self._may_have_hints(direction, x=x, y=y, distance=distance):
+            return []
         if direction == DirectionType.RIGHT:
-            return await self.get_hints_right(db, x=x, y=y)
+            return await self.get_hints_right(db, x=x, y=y, distance=distance)
         elif direction == DirectionType.LEFT:
-            return await self.get_hints_left(db, x=x, y=y)
+            return await self.get_hints_left(db, x=x, y=y, distance=distance)
         elif direction == DirectionType.UP:
-            return await self.get_hints_up(db, x=x, y=y)
+            return await self.get_hints_up(db, x=x, y=y, distance=distance)
         elif direction == DirectionType.DOWN:
-            return await self.get_hints_down(db, x=x, y=y)
+            return await self.get_hints_down(db, x=x, y=y, distance=distance)
+        elif direction == DirectionType.ALL:
+            return await self.get_hints_all(db, x=x, y=y, distance=distance)
         else:
             raise ValueError('Invalid direction')
 
-    async def get_hints_right(self, db: AsyncSession, y: int, x: int) -> Sequence[Hint]:
-        query = select(Hint).where(Hint.posY == y, Hint.posX > x, Hint.posX <= x + 10)
-        result = await db.exec(query)
+    async def get_hints_right(self, db: AsyncSession, y: int, x: int, distance: int = 10) -> Sequence[Row]:
+        query = self._select().where(self._window(DirectionType.RIGHT, x=x, y=y, distance=distance))
+        result = await db.exec(query.order_by(Hint.posX))
         return result.all()
 
-    async def get_hints_left(self, db: AsyncSession, y: int, x: int) -> Sequence[Hint]:
-        query = select(Hint).where(Hint.posY == y, Hint.posX < x, Hint.posX >= x - 10)
-        result = await db.exec(query)
+    async def get_hints_left(self, db: AsyncSession, y: int, x: int, distance: int = 10) -> Sequence[Row]:
+        query = self._select().where(self._window(DirectionType.LEFT, x=x, y=y, distance=distance))
+        result = await db.exec(query.order_by(Hint.posX.desc()))
         return result.all()
 
-    async def get_hints_up(self, db: AsyncSession, x: int, y: int) -> Sequence[Hint]:
-        query = select(Hint).where(Hint.posX == x, Hint.posY < y, Hint.posY >= y - 10)
-        result = await db.exec(query)
+    async def get_hints_up(self, db: AsyncSession, x: int, y: int, distance: int = 10) -> Sequence[Row]:
+        query = self._select().where(self._window(DirectionType.UP, x=x, y=y, distance=distance))
+        result = await db.exec(query.order_by(Hint.posY.desc()))
+        return result.all()
+
+    async def get_hints_down(self, db: AsyncSession, x: int, y: int, distance: int = 10) -> Sequence[Row]:
+        query = self._select().where(self._window(DirectionType.DOWN, x=x, y=y, distance=distance))
+        result = await db.exec(query.order_by(Hint.posY))
+        return result.all()
+
+    async def get_hints_all(self, db: AsyncSession, x: int, y: int, distance: int = 10) -> Sequence[Row]:
+        """
+        Get hints in all four directions with one query, sorted by distance
+
+        :param db:
+        :param x:
+        :param y:
+        :param distance:
+        :return:
+        """
+        query = self._select().where(self._window(DirectionType.ALL, x=x, y=y, distance=distance))
+        result = await db.exec(query.order_by(self._distance(x=x, y=y)))
+        return result.all()
+
+    async def get_nearest_by_poi(
+        self, db: AsyncSession, direction: DirectionType, x: int, y: int, poi: int | str
+    ) -> Row | None:
+        """
+        Get the nearest hint for a POI in the given direction, at any distance
+
+        :param db:
+        :param direction:
+        :param x:
+        :param y:
+        :param poi: poi_id, or POI name in any language, case-insensitive
+        :return:
+        """
+        if not self._may_have_hints(direction, x=x, y=y):
+            return None
+        if isinstance(poi, int):
+            match = Hint.poi_id == poi
+        else:
+            name = poi_key(poi)
+            match = or_(*(func.lower(self._poi_name(field)) == name for field in HINT_NAME_FIELDS))
+        query = self._select().where(self._ray(direction, x=x, y=y), match)
+        result = await db.exec(query.order_by(self._distance(x=x, y=y)).limit(1))
+        return result.first()
+
+    async def get_by_direction_lang(
+        self, db: AsyncSession, direction: DirectionType, x: int, y: int, lang: LanguageType, distance: int = 10
+    ) -> Sequence[Row]:
+        """
+        Get hints in the given direction sorted by distance, selecting only the requested language column
+
+        :param db:
+        :param direction:
+        :param x:
+        :param y:
+        :param lang:
+        :param distance:
+        :return: (id, posX, posY, hint) rows
+        """
+        if not self._may_have_hints(direction, x=x, y=y, distance=distance):
+            return []
+        query = self._select(lang).where(self._window(direction, x=x, y=y, distance=distance))
+        result = await db.exec(query.order_by(self._distance(x=x, y=y)))
+        return result.all()
+
+    async def get_compact_by_direction(
+        self, db: AsyncSession, direction: DirectionType, x: int, y: int, distance: int = 10
+    ) -> Sequence[Row]:
+        """
+        Get hints in the given direction sorted by distance, without joining POI names
+
+        :param db:
+        :param direction:
+        :param x:
+        :param y:
+        :param distance:
+        :return: (posX, posY, poi_id) rows
+        """
+        if not self._may_have_hints(direction, x=x, y=y, distance=distance):
+            return []
+        query = select(Hint.posX, Hint.posY, Hint.poi_id).where(self._window(direction, x=x, y=y, distance=distance))
+        result = await db.exec(query.order_by(self._distance(x=x, y=y)))
         return result.all()
 
-    async def get_hints_down(self, db: AsyncSession, x: int, y: int) -> Sequence[Hint]:
-        query = select(Hint).where(Hint.posX == x, Hint.posY > y, Hint.posY <= y + 10)
+    async def get_by_directions(
+        self, db: AsyncSession, lookups: Sequence[tuple[DirectionType, int, int, int]]
+    ) -> list[list[Row]]:
+        """
+        Answer many directional lookups in a single query by joining hints against a VALUES list
+
+        :param db:
+        :param lookups: (direction, x, y, distance) tuples
+        :return: hints for each lookup sorted by distance, in lookup order
+        """
+        results: list[list[Row]] = [[] for _ in lookups]
+        pending = [
+            (idx, direction.value, x, y, distance)
+            for idx, (direction, x, y, distance) in enumerate(lookups)
+            if self._may_have_hints(direction, x=x, y=y, distance=distance)
+        ]
+        if not pending:
+            return results
+        lookup = values(
+            column('idx', Integer),
+            column('direction', String),
+            column('x', Integer),
+            column('y', Integer),
+            column('distance', Integer),
+            name='lookup',
+        ).data(pending)
+        on = or_(
+            *(
+                and_(
+                    lookup.c.direction == direction.value,
+                    self._window(direction, x=lookup.c.x, y=lookup.c.y, distance=lookup.c.distance),
+                )
+                for direction in DirectionType
+            )
+        )
+        query = (
+            self._select()
+            .add_columns(lookup.c.idx)
+            .join(lookup, on)
+            .order_by(lookup.c.idx, self._distance(x=lookup.c.x, y=lookup.c.y))
+        )
         result = await db.exec(query)
+        for row in result.all():
+            results[row.idx].append(row)
+        return results
+
+    async def get_occupancy(self, db: AsyncSession) -> HintOccupancy:
+        """
+        Get the occupied rows and columns, read from the coordinate indexes
+
+        :param db:
+        :return:
+        """
+        xs = await db.exec(select(Hint.posX).distinct())
+        ys = await db.exec(select(Hint.posY).distinct())
+        return HintOccupancy(xs=xs.all(), ys=ys.all())
+
+    async def get_columns(self, db: AsyncSession) -> Sequence[Sequence[Any]]:
+        """
+        Get all hints as plain column tuples, without hydrating ORM objects
+
+        :param db:
+        :return:
+        """
+        result = await db.exec(self._select())
+        return result.all()
+
+    async def get_columns_in_box(self, db: AsyncSession, x0: int, y0: int, x1: int, y1: int) -> Sequence[Sequence[Any]]:
+        """
+        Get hints with x0 <= posX < x1 and y0 <= posY < y1 as plain column tuples, sorted by (posY, posX)
+
+        :param db:
+        :param x0:
+        :param y0:
+        :param x1:
+        :param y1:
+        :return:
+        """
+        query = self._select().where(Hint.posY >= y0, Hint.posY < y1, Hint.posX >= x0, Hint.posX < x1)
+        result = await db.exec(query.order_by(Hint.posY, Hint.posX))
         return result.all()
 
+    async def stream_columns(
+        self, db: AsyncSession, lang: LanguageType | None = None, batch_size: int = 5000
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Walk all hints ordered by id with a server-side cursor, without hydrating ORM objects
+
+        :param db:
+        :param lang: select only the requested language column, labelled hint
+        :param batch_size: rows fetched per round trip
+        :return: batches of column rows
+        """
+        query = self._select(lang).order_by(Hint.id)
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+
+    async def create_staging(self, db: AsyncSession) -> None:
+        """Create empty staging copies of the poi and hints tables, private to the session and dropped on commit"""
+        for table in (Poi.__tablename__, Hint.__tablename__):
+            await db.execute(text(f'CREATE TEMP TABLE {table}_staging (LIKE {table}) ON COMMIT DROP'))
+
+    async def copy_to_staging(
+        self, db: AsyncSession, pois: Sequence[Sequence[Any]], hints: Sequence[Sequence[Any]]
+    ) -> None:
+        """
+        Bulk load rows into the staging tables with COPY, bypassing the ORM
+
+        :param db:
+        :param pois: (id, name_fr, name_en, name_es, name_de, name_pt) tuples
+        :param hints: (id, posX, posY, poi_id) tuples
+        :return:
+        """
+        conn = await db.connection()
+        driver = (await conn.get_raw_connection()).driver_connection
+        if pois:
+            await driver.copy_records_to_table(POI_STAGING, records=pois, columns=POI_STAGING_COLUMNS)
+        if hints:
+            await driver.copy_records_to_table(HINTS_STAGING, records=hints, columns=HINTS_STAGING_COLUMNS)
+
+    async def merge_staging(self, db: AsyncSession) -> tuple[int, int]:
+        """
+        Make poi and hints match the staging tables, rows are upserted by id so the load can be re-run
+
+        :param db:
+        :return: number of hints inserted or changed, number of hints deleted
+        """
+        await db.execute(text(self._upsert_sql(Poi.__tablename__, POI_STAGING, POI_STAGING_COLUMNS)))
+        changed = await db.execute(text(self._upsert_sql(Hint.__tablename__, HINTS_STAGING, HINTS_STAGING_COLUMNS)))
+        deleted = await db.execute(
+            text(f'DELETE FROM hints WHERE NOT EXISTS (SELECT 1 FROM {HINTS_STAGING} s WHERE s.id = hints.id)')
+        )
+        await db.execute(text(f'DELETE FROM poi WHERE NOT EXISTS (SELECT 1 FROM {POI_STAGING} s WHERE s.id = poi.id)'))
+        return changed.rowcount, deleted.rowcount
+
+    def _may_have_hints(self, direction: DirectionType, x: int, y: int, distance: int | None = None) -> bool:
+        return self.occupancy is None or self.occupancy.may_have_hints(direction, x=x, y=y, distance=distance)
+
+    @staticmethod
+    def _upsert_sql(table: str, staging: str, columns: Sequence[str]) -> str:
+        """
+        Copy staged rows into a table by id, rows that are already identical are left untouched
+
+        :param table:
+        :param staging:
+        :param columns: id first
+        :return:
+        """
+        quoted = [f'"{name}"' for name in columns]
+        names = ', '.join(quoted)
+        updates = ', '.join(f'{name} = EXCLUDED.{name}' for name in quoted[1:])
+        current = ', '.join(f'{table}.{name}' for name in quoted[1:])
+        excluded = ', '.join(f'EXCLUDED.{name}' for name in quoted[1:])
+        return (
+            f'INSERT INTO {table} ({names}) SELECT {names} FROM {staging} '
+            f'ON CONFLICT (id) DO UPDATE SET {updates} WHERE ({current}) IS DISTINCT FROM ({excluded})'
+        )
+
+    @classmethod
+    def _select(cls, lang: LanguageType | None = None) -> Select:
+        """
+        Select hint columns joined with the names of their POI, labelled like the hint fields of the API
+
+        :param lang: select only the requested language, labelled hint
+        :return: (id, posX, posY, poi_id, hint_fr, hint_en, hint_es, hint_de, hint_pt) or
+            (id, posX, posY, poi_id, hint) rows
+        """
+        if lang is None:
+            names = [cls._poi_name(field).label(field) for field in HINT_NAME_FIELDS]
+        else:
+            names = [cls._poi_name(f'hint_{lang.value}').label('hint')]
+        return select(Hint.id, Hint.posX, Hint.posY, Hint.poi_id, *names).join(Poi, Poi.id == Hint.poi_id)
+
+    @staticmethod
+    def _poi_name(field: str) -> ColumnElement[str]:
+        """POI name column behind a hint name field, hint_fr is stored as poi.name_fr"""
+        return getattr(Poi, field.replace('hint_', 'name_', 1))
+
+    @staticmethod
+    def _window(
+        direction: DirectionType,
+        x: int | ColumnElement,
+        y: int | ColumnElement,
+        distance: int | ColumnElement = 10,
+    ) -> ColumnElement[bool]:
+        """
+        Filter for the cells within distance of (x, y) in the given direction
+
+        :param direction:
+        :param x: literal or column expression
+        :param y: literal or column expression
+        :param distance: literal or column expression
+        :return:
+        """
+        if direction == DirectionType.RIGHT:
+            return and_(Hint.posY == y, Hint.posX > x, Hint.posX <= x + distance)
+        elif direction == DirectionType.LEFT:
+            return and_(Hint.posY == y, Hint.posX < x, Hint.posX >= x - distance)
+        elif direction == DirectionType.UP:
+            return and_(Hint.posX == x, Hint.posY < y, Hint.posY >= y - distance)
+        elif direction == DirectionType.DOWN:
+            return and_(Hint.posX == x, Hint.posY > y, Hint.posY <= y + distance)
+        elif direction == DirectionType.ALL:
+            return or_(*(CRUDHints._window(d, x=x, y=y, distance=distance) for d in DirectionType.moves()))
+        else:
+            raise ValueError('Invalid direction')
+
+    @staticmethod
+    def _ray(direction: DirectionType, x: int, y: int) -> ColumnElement[bool]:
+        """
+        Filter for every cell past (x, y) in the given direction, with no distance bound
+
+        :param direction:
+        :param x:
+        :param y:
+        :return:
+        """
+        if direction == DirectionType.RIGHT:
+            return and_(Hint.posY == y, Hint.posX > x)
+        elif direction == DirectionType.LEFT:
+            return and_(Hint.posY == y, Hint.posX < x)
+        elif direction == DirectionType.UP:
+            return and_(Hint.posX == x, Hint.posY < y)
+        elif direction == DirectionType.DOWN:
+            return and_(Hint.posX == x, Hint.posY > y)
+        else:
+            raise ValueError('Invalid direction')
+
+    @staticmethod
+    def _distance(x: int | ColumnElement, y: int | ColumnElement) -> ColumnElement[int]:
+        """
+        Distance from (x, y), hints in a window share a row or column with it
+
+        :param x: literal or column expression
+        :param y: literal or column expression
+        :return:
+        """
+        return func.abs(Hint.posX - x) + func.abs(Hint.posY - y)
+
 
 hints_dao = CRUDHints(Hint)
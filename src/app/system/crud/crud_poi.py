@@ -0,0 +1,38 @@
+from typing import Sequence
+
+from sqlalchemy import Row
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.app.system.crud.base import CRUDBase
+from src.app.system.models.poi import Poi
+from src.app.system.schema.poi import PoiCreate, PoiUpdate
+from src.common.enums import LanguageType
+
+
+class CRUDPoi(CRUDBase[Poi, PoiCreate, PoiUpdate]):
+    async def get_names(self, db: AsyncSession, lang: LanguageType) -> Sequence[Row]:
+        """
+        Get the name of every POI in a single language
+
+        :param db:
+        :param lang:
+        :return: (id, name) rows ordered by id
+        """
+        name = getattr(Poi, f'name_{lang.value}').label('name')
+        result = await db.exec(select(Poi.id, name).order_by(Poi.id))
+        return result.all()
+
+    async def get_columns(self, db: AsyncSession) -> Sequence[Row]:
+        """
+        Get every POI with its names as plain column tuples
+
+        :param db:
+        :return: (id, name_fr, name_en, name_es, name_de, name_pt) rows
+        """
+        query = select(Poi.id, Poi.name_fr, Poi.name_en, Poi.name_es, Poi.name_de, Poi.name_pt)
+        result = await db.exec(query)
+        return result.all()
+
+
+poi_dao = CRUDPoi(Poi)
@@ -56,7 +56,7 @@ class CRUDUser(CRUDPlus[User]):
         :return:
         """
         salt = bcrypt.gensalt()
-        obj.password = get_hash_password(f'{obj.password}', salt)
+        obj.password = await get_hash_password(f'{obj.password}', salt)
         dict_obj = obj.model_dump()
         dict_obj.update({'salt': salt})
         new_user = self.model(**dict_obj)
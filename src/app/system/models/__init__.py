@@ -1,9 +1,11 @@
 from .hints import Hint
 from .login_log import LoginLog
+from .poi import Poi
 from .user import User
 
 __all__ = [
     'User',
     'LoginLog',
     'Hint',
+    'Poi',
 ]
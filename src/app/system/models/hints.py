@@ -1,14 +1,16 @@
-from sqlmodel import Field, SQLModel
+from sqlmodel import Field, Index, SQLModel
 
 
 class Hint(SQLModel, table=True):
     __tablename__: str = 'hints'
+    __table_args__ = (
+        # Row lookups (left/right): equality on posY, range on posX
+        Index('ix_hints_posY_posX', 'posY', 'posX'),
+        # Column lookups (up/down): equality on posX, range on posY
+        Index('ix_hints_posX_posY', 'posX', 'posY'),
+    )
 
     id: int = Field(primary_key=True)
     posX: int
     posY: int
-    hint_fr: str
-    hint_en: str
-    hint_es: str
-    hint_de: str
-    hint_pt: str
+    poi_id: int = Field(foreign_key='poi.id', index=True)
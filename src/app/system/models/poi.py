@@ -0,0 +1,14 @@
+from sqlmodel import Field, SQLModel
+
+
+class Poi(SQLModel, table=True):
+    """Point of interest, its translated names are shared by every hint pointing at it"""
+
+    __tablename__: str = 'poi'
+
+    id: int = Field(primary_key=True)
+    name_fr: str
+    name_en: str
+    name_es: str
+    name_de: str
+    name_pt: str
@@ -1,4 +1,10 @@
-from pydantic import BaseModel
+from typing import Annotated
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+from src.common.enums import DirectionType, LanguageType
+from src.common.schema import SchemaBase
+from src.core.conf import settings
 
 
 class HintCreate(BaseModel):
@@ -7,3 +13,75 @@ class HintCreate(BaseModel):
 
 class HintUpdate(BaseModel):
     pass
+
+
+class HintRequest(BaseModel):
+    x: int
+    y: int
+    direction: DirectionType
+    lang: LanguageType | None = None
+    compact: bool = Field(
+        default=False, description='Return (posX, posY, poi_id) tuples, names are served by the /hunt/pois catalogue'
+    )
+    max_distance: int | None = Field(
+        default=None,
+        ge=1,
+        le=settings.HUNT_HINTS_MAX_DISTANCE,
+        description=f'Cells to search, defaults to {settings.HUNT_HINTS_DEFAULT_DISTANCE}',
+    )
+
+    @property
+    def distance(self) -> int:
+        return self.max_distance or settings.HUNT_HINTS_DEFAULT_DISTANCE
+
+
+class HintNearestRequest(BaseModel):
+    x: int
+    y: int
+    direction: DirectionType
+    poi: int | Annotated[str, Field(min_length=1)] = Field(
+        description='POI id as served by /hunt/pois, or POI name in any language, case-insensitive'
+    )
+    lang: LanguageType | None = None
+
+    @field_validator('direction')
+    @classmethod
+    def check_direction(cls, v: DirectionType) -> DirectionType:
+        if v == DirectionType.ALL:
+            raise ValueError('Nearest lookups need a single direction')
+        return v
+
+
+class GetHintDetail(SchemaBase):
+    """Hint with the names of its POI in every language"""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    posX: int
+    posY: int
+    hint_fr: str
+    hint_en: str
+    hint_es: str
+    hint_de: str
+    hint_pt: str
+
+
+class GetHintLangDetail(SchemaBase):
+    """Hint projected on a single language"""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    posX: int
+    posY: int
+    hint: str
+
+
+# (posX, posY, poi_id)
+CompactHint = tuple[int, int, int]
+
+# Hints sorted by distance, grouped by direction when looking in all directions
+HintList = list[GetHintDetail] | list[GetHintLangDetail] | list[CompactHint]
+HintResult = HintList | dict[DirectionType, HintList]
+HintDetail = GetHintDetail | GetHintLangDetail
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+
+from src.common.enums import LanguageType
+from src.common.schema import SchemaBase
+from src.core.conf import settings
+
+
+class PoiCreate(BaseModel):
+    pass
+
+
+class PoiUpdate(BaseModel):
+    pass
+
+
+class PoiSearchRequest(BaseModel):
+    q: str = Field(min_length=1, max_length=100, description='POI name, typos and missing accents are tolerated')
+    lang: LanguageType | None = Field(default=None, description='Only match names in this language')
+    limit: int = Field(default=10, ge=1, le=settings.HUNT_SEARCH_MAX_LIMIT)
+
+
+class GetPoiSearchDetail(SchemaBase):
+    """POI matching a search, with its best matching name"""
+
+    id: int
+    lang: LanguageType
+    name: str
+    score: float
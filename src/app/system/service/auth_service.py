@@ -10,15 +10,18 @@ from src.app.system.service.login_log_service import login_log_service
 from src.common.enums import LoginLogStatusType
 from src.common.exception import errors
 from src.common.security.jwt import (
+    bump_user_epoch,
     create_access_token,
     create_refresh_token,
     get_token,
+    invalidate_user_cache,
     jwt_decode,
     password_verify,
+    revoke_user_sessions,
 )
+from src.common.security.session import session_store
 from src.core.conf import settings
 from src.database.db_postgres import async_db_session
-from src.database.db_redis import redis_client
 from src.utils.timezone import timezone
 
 
@@ -29,7 +32,7 @@ class AuthService:
             current_user = await user_dao.get_by_username(db, obj.username)
             if not current_user:
                 raise errors.NotFoundError(msg="Invalid username or password")
-            elif not password_verify(f"{obj.password}", current_user.password):
+            elif not await password_verify(f"{obj.password}", current_user.password):
                 raise errors.AuthorizationError(msg="Invalid username or password")
             elif not current_user.status:
                 raise errors.AuthorizationError(
@@ -56,7 +59,7 @@ class AuthService:
                     raise errors.NotFoundError(msg="Invalid username or password")
                 user_uuid = current_user.uuid
                 username = current_user.username
-                if not password_verify(obj.password, current_user.password):
+                if not await password_verify(obj.password, current_user.password):
                     raise errors.AuthorizationError(msg="Invalid username or password")
                 elif not current_user.status:
                     raise errors.AuthorizationError(
@@ -142,16 +145,15 @@ class AuthService:
         refresh_token = request.cookies.get(settings.COOKIE_REFRESH_TOKEN_KEY)
         response.delete_cookie(settings.COOKIE_REFRESH_TOKEN_KEY)
         if request.user.is_multi_login:
-            key = f"{settings.TOKEN_REDIS_PREFIX}:{request.user.id}:{token}"
-            await redis_client.delete(key)
-            if refresh_token:
-                key = f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{request.user.id}:{refresh_token}"
-                await redis_client.delete(key)
+            await session_store.revoke(
+                request.user.id, access_token=token, refresh_token=refresh_token
+            )
+            # A stateless token cannot be revoked alone, other sessions go with it
+            if settings.TOKEN_STATELESS_ENABLED:
+                await bump_user_epoch(request.user.id)
+            await invalidate_user_cache(request.user.id)
         else:
-            key_prefix = f"{settings.TOKEN_REDIS_PREFIX}:{request.user.id}:"
-            await redis_client.delete_prefix(key_prefix)
-            key_prefix = f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{request.user.id}:"
-            await redis_client.delete_prefix(key_prefix)
+            await revoke_user_sessions(request.user.id)
 
 
 auth_service: AuthService = AuthService()
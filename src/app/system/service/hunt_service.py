@@ -1,14 +1,502 @@
+import asyncio
+import json
+import os
+import zlib
+
+from typing import Any, AsyncIterator, Sequence
+
+from fastapi import Request
+from pydantic import TypeAdapter
+from sqlalchemy import Row
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from src.app.system.crud.crud_hints import hints_dao
-from src.app.system.models.hints import Hint
-from src.common.enums import DirectionType
+from src.app.system.crud.crud_poi import poi_dao
+from src.app.system.schema.hints import (
+    CompactHint,
+    GetHintDetail,
+    GetHintLangDetail,
+    HintDetail,
+    HintList,
+    HintNearestRequest,
+    HintRequest,
+    HintResult,
+)
+from src.app.system.schema.poi import GetPoiSearchDetail, PoiSearchRequest
+from src.common.enums import DirectionType, LanguageType
+from src.common.exception import errors
+from src.common.hint_answers import HintAnswers
+from src.common.hint_index import HintIndex
+from src.common.hint_tile import TILE_VERSION, encode_tile, tile_of
+from src.common.log import log
+from src.common.poi_search import PoiSearchIndex
+from src.common.pubsub import redis_subscriber
+from src.common.security.jwt import superuser_verify
+from src.core.conf import settings
+from src.core.path_conf import DATA_DIR, HINT_ANSWERS_FILE, HINT_SNAPSHOT_FILE
 from src.database.db_postgres import async_engine
+from src.database.db_redis import redis_client
+from src.utils.http_cache import make_etag
+
+_hints_adapter = TypeAdapter(list[GetHintDetail])
+_hints_lang_adapter = TypeAdapter(list[GetHintLangDetail])
+_hints_compact_adapter = TypeAdapter(list[CompactHint])
 
 
 class HuntService:
+    # In-memory hint index, None until loaded at startup
+    index: HintIndex | None = None
+    # Precomputed answers mapped from the answers file, None unless loaded at startup
+    answers: HintAnswers | None = None
+    # Encoded tiles keyed by (tx, ty), only valid for tiles_version
+    tiles: dict[tuple[int, int], bytes] = {}
+    tiles_version: int | None = None
+    # Encoded POI catalogues keyed by language, only valid for pois_version
+    pois: dict[LanguageType, bytes] = {}
+    pois_version: int | None = None
+    # POI name search index, None until loaded at startup
+    search_index: PoiSearchIndex | None = None
+    # Rebuild of the search index for a lookup that found it missing or stale, shared by concurrent lookups
+    search_task: asyncio.Task | None = None
+    # Whether this worker is reloading the dataset, and whether another reload was requested meanwhile
+    reloading: bool = False
+    reload_requested: bool = False
+    # Background rebuild of an occupancy found stale by a lookup
+    occupancy_task: asyncio.Task | None = None
+
+    @classmethod
+    async def load_index(cls) -> None:
+        """Build a new hint index off the event loop, then swap it in with a single assignment"""
+        if settings.HUNT_HINTS_SNAPSHOT_ENABLED:
+            index = await cls._open_snapshot()
+            if index is not None:
+                cls.index = index
+                log.info(f'Hint index mapped from snapshot with {index.size} hints')
+                return
+        # Read the version first, the rows loaded next are at least that recent
+        version = await cls.get_dataset_version()
+        async with AsyncSession(async_engine) as db:
+            rows = await hints_dao.get_columns(db)
+        index = await asyncio.to_thread(HintIndex, rows)
+        index.dataset_version = version
+        cls.index = index
+        log.info(f'Hint index loaded with {index.size} hints')
+
+    @classmethod
+    async def load_search_index(cls) -> None:
+        """Build a new POI search index off the event loop, then swap it in with a single assignment"""
+        # Read the version first, the names loaded next are at least that recent
+        version = await cls.get_served_version()
+        async with AsyncSession(async_engine) as db:
+            rows = await poi_dao.get_columns(db)
+        index = await asyncio.to_thread(PoiSearchIndex, rows)
+        index.dataset_version = version
+        cls.search_index = index
+        log.info(f'POI search index built with {index.size} names')
+
+    @classmethod
+    async def load_occupancy(cls) -> None:
+        """Load the occupied rows and columns, queries for lookups that cannot find hints are then skipped"""
+        # Read the version first, the coordinates loaded next are at least that recent
+        version = await cls.get_dataset_version()
+        async with AsyncSession(async_engine) as db:
+            occupancy = await hints_dao.get_occupancy(db)
+        occupancy.dataset_version = version
+        hints_dao.occupancy = occupancy
+        log.info(f'Hint occupancy loaded with bounds {occupancy.bounds}')
+
+    @classmethod
+    def check_occupancy(cls, version: int) -> None:
+        """
+        Drop the occupancy when it was built for another dataset version, and rebuild it in the background
+
+        Until then every lookup goes to postgres, a stale occupancy would answer empty for rows and columns
+        filled since, and that answer would be cached under the new version
+
+        :param version: dataset version the lookup is answered for
+        :return:
+        """
+        occupancy = hints_dao.occupancy
+        if occupancy is None or occupancy.dataset_version == version:
+            return
+        hints_dao.occupancy = None
+        log.warning(f'Hint occupancy is for dataset version {occupancy.dataset_version} instead of {version}')
+        if cls.occupancy_task is None or cls.occupancy_task.done():
+            cls.occupancy_task = asyncio.create_task(cls._reload_occupancy())
+
+    @classmethod
+    async def _reload_occupancy(cls) -> None:
+        try:
+            await cls.load_occupancy()
+        except Exception as e:
+            log.error(f'Hint occupancy reload failed, lookups keep going to postgres: {e}')
+
+    @classmethod
+    async def reload_dataset(cls, request: Request) -> int:
+        """
+        Move every worker to a new dataset version, each one rebuilds its index in the background
+        and keeps serving the previous one until the swap
+
+        :param request:
+        :return: the new dataset version
+        """
+        superuser_verify(request)
+        version = await cls.bump_dataset_version()
+        if settings.HUNT_HINTS_INDEX_ENABLED and settings.HUNT_HINTS_SNAPSHOT_ENABLED:
+            await cls.write_snapshot()
+        if settings.HUNT_HINTS_ANSWERS_ENABLED:
+            await cls.write_answers()
+        await redis_subscriber.publish(settings.HUNT_RELOAD_CHANNEL, version)
+        return version
+
+    @classmethod
+    async def on_reload(cls, message: str) -> None:
+        """
+        Handle a reload broadcast, the index is built off the event loop so lookups keep being served
+
+        Reloads run one at a time, the ones requested while a reload runs are coalesced into a single
+        reload after it so the latest dataset is always the last one swapped in
+
+        :param message: the new dataset version
+        :return:
+        """
+        log.info(f'Hint dataset reload to version {message} requested')
+        cls.reload_requested = True
+        if cls.reloading:
+            return
+        cls.reloading = True
+        try:
+            while cls.reload_requested:
+                cls.reload_requested = False
+                await cls._reload()
+        finally:
+            cls.reloading = False
+
+    @classmethod
+    async def _reload(cls) -> None:
+        try:
+            if settings.HUNT_HINTS_INDEX_ENABLED:
+                await cls.load_index()
+            if settings.HUNT_HINTS_ANSWERS_ENABLED:
+                await cls.load_answers()
+            if settings.HUNT_HINTS_OCCUPANCY_ENABLED:
+                await cls.load_occupancy()
+            await cls.load_search_index()
+        except Exception as e:
+            log.error(f'Hint dataset reload failed, still serving the previous one: {e}')
+
+    @classmethod
+    async def warm_up(cls, cells: list[tuple[int, int]]) -> None:
+        """
+        Run the lookups of each cell in every direction and encode its tile, filling the caches in front of them
+
+        :param cells: (x, y) cells
+        :return:
+        """
+        for x, y in cells:
+            for direction in DirectionType:
+                await cls.get_hints(HintRequest(x=x, y=y, direction=direction))
+            tx, ty = tile_of(x, y, settings.HUNT_TILE_SIZE)
+            await cls.get_tile(tx=tx, ty=ty)
+
+    @classmethod
+    async def get_served_version(cls) -> int:
+        """Dataset version of the hints this worker serves, the loaded index's or else the latest one"""
+        index = cls.index
+        if index is not None and index.dataset_version is not None:
+            return index.dataset_version
+        return await cls.get_dataset_version()
+
+    @classmethod
+    async def _open_snapshot(cls) -> HintIndex | None:
+        """Map the snapshot file when it exists and matches the current dataset version"""
+        if not os.path.exists(HINT_SNAPSHOT_FILE):
+            return None
+        try:
+            index = HintIndex.open_snapshot(HINT_SNAPSHOT_FILE)
+        except ValueError as e:
+            log.warning(f'{e}, run `seed --snapshot` to refresh it')
+            return None
+        version = await cls.get_dataset_version()
+        if index.dataset_version != version:
+            log.warning(
+                f'Hint snapshot is for dataset version {index.dataset_version} instead of {version}, '
+                'run `seed --snapshot` to refresh it'
+            )
+            return None
+        return index
+
+    @classmethod
+    async def write_snapshot(cls) -> int:
+        """Write the hint index snapshot for the current dataset version, shared by every worker through mmap"""
+        version = await cls.get_dataset_version()
+        async with AsyncSession(async_engine) as db:
+            rows = await hints_dao.get_columns(db)
+        os.makedirs(DATA_DIR, exist_ok=True)
+        index = await asyncio.to_thread(HintIndex, rows)
+        await asyncio.to_thread(index.write_snapshot, HINT_SNAPSHOT_FILE, dataset_version=version)
+        return version
+
+    @classmethod
+    async def load_answers(cls) -> None:
+        """Map the answers file when it matches the current dataset version, lookups go to the index otherwise"""
+        cls.answers = await cls._open_answers()
+        if cls.answers is not None:
+            log.info(f'Hint answers mapped with {cls.answers.size} lookups')
+
+    @classmethod
+    async def _open_answers(cls) -> HintAnswers | None:
+        """Map the answers file when it exists and matches the current dataset version"""
+        if not os.path.exists(HINT_ANSWERS_FILE):
+            log.warning(f'Hint answers file {HINT_ANSWERS_FILE} not found, run `seed --answers` first')
+            return None
+        try:
+            answers = HintAnswers.open(HINT_ANSWERS_FILE)
+        except ValueError as e:
+            log.warning(f'{e}, run `seed --answers` to refresh it')
+            return None
+        version = await cls.get_dataset_version()
+        if answers.dataset_version != version:
+            log.warning(
+                f'Hint answers are for dataset version {answers.dataset_version} instead of {version}, '
+                'run `seed --answers` to refresh them'
+            )
+            return None
+        return answers
+
+    @classmethod
+    async def write_answers(cls) -> int:
+        """Precompute the answer of every lookup with hints and write them to the answers file"""
+        # Read the version first, the rows loaded next are at least that recent
+        version = await cls.get_dataset_version()
+        async with AsyncSession(async_engine) as db:
+            rows = await hints_dao.get_columns(db)
+        return await asyncio.to_thread(cls._dump_answers, rows, version)
+
+    @staticmethod
+    def _dump_answers(rows: Sequence[Sequence[Any]], version: int) -> int:
+        """
+        Build the answers of a hint table and write them to the answers file, blocking
+
+        :param rows: (id, posX, posY, poi_id, hint_fr, hint_en, hint_es, hint_de, hint_pt) tuples
+        :param version: dataset version of the rows, stamped in the file header
+        :return: number of answers written
+        """
+        index = HintIndex(rows)
+        os.makedirs(DATA_DIR, exist_ok=True)
+        return HintAnswers.write(
+            HINT_ANSWERS_FILE, index, distance=settings.HUNT_HINTS_DEFAULT_DISTANCE, dataset_version=version
+        )
+
+    @classmethod
+    def get_answer(cls, request: HintRequest) -> bytes | None:
+        """Get the precomputed JSON answer of a lookup, None when answers are not loaded or do not cover it"""
+        if cls.answers is None:
+            return None
+        if request.lang is not None or request.compact or request.direction == DirectionType.ALL:
+            return None
+        if request.distance != settings.HUNT_HINTS_DEFAULT_DISTANCE:
+            return None
+        return cls.answers.get(direction=request.direction, x=request.x, y=request.y)
+
+    @staticmethod
+    async def get_dataset_version() -> int:
+        version = await redis_client.get(settings.HUNT_DATASET_VERSION_REDIS_KEY)
+        return int(version or 0)
+
+    @staticmethod
+    async def bump_dataset_version() -> int:
+        """Move to a new dataset version, hints cached under the previous one become unreachable"""
+        return await redis_client.incr(settings.HUNT_DATASET_VERSION_REDIS_KEY)
+
+    @classmethod
+    async def get_hints_etag(cls, request: HintRequest) -> str:
+        """ETag of a lookup answer, it only changes when the dataset is reloaded"""
+        version = await cls.get_served_version()
+        projection = cls._projection_key(request)
+        return make_etag(version, request.x, request.y, request.direction.value, projection, request.distance)
+
+    @classmethod
+    async def get_hints(cls, request: HintRequest) -> HintResult:
+        x, y, direction, lang, distance = request.x, request.y, request.direction, request.lang, request.distance
+        if cls.index is not None:
+            return cls.index.get_by_direction(
+                direction=direction, x=x, y=y, distance=distance, lang=lang, compact=request.compact
+            )
+        # Read-through redis cache in front of postgres, shared by every replica
+        version = await cls.get_dataset_version()
+        projection = cls._projection_key(request)
+        key = f'{settings.HUNT_HINTS_REDIS_PREFIX}:{version}:{x}:{y}:{direction.value}:{projection}:{distance}'
+        if request.compact:
+            adapter = _hints_compact_adapter
+        else:
+            adapter = _hints_adapter if lang is None else _hints_lang_adapter
+        cache_hints = await redis_client.get(key)
+        if cache_hints is not None:
+            hints = adapter.validate_json(cache_hints)
+        else:
+            cls.check_occupancy(version)
+            async with AsyncSession(async_engine) as db:
+                if request.compact:
+                    rows = await hints_dao.get_compact_by_direction(
+                        db=db, direction=direction, x=x, y=y, distance=distance
+                    )
+                    hints = [tuple(row) for row in rows]
+                elif lang is None:
+                    rows = await hints_dao.get_by_direction(db=db, direction=direction, x=x, y=y, distance=distance)
+                    hints = [GetHintDetail.model_validate(row) for row in rows]
+                else:
+                    rows = await hints_dao.get_by_direction_lang(
+                        db=db, direction=direction, x=x, y=y, lang=lang, distance=distance
+                    )
+                    hints = [GetHintLangDetail.model_validate(row) for row in rows]
+            await redis_client.setex(key, settings.HUNT_HINTS_REDIS_EXPIRE_SECONDS, adapter.dump_json(hints))
+        return cls._group(hints, x=x, y=y) if direction == DirectionType.ALL else hints
+
+    @classmethod
+    async def get_hints_batch(cls, requests: list[HintRequest]) -> list[HintResult]:
+        if len(requests) > settings.HUNT_HINTS_BATCH_MAX_SIZE:
+            raise errors.RequestError(msg=f'At most {settings.HUNT_HINTS_BATCH_MAX_SIZE} lookups per batch')
+        if cls.index is not None:
+            return [
+                cls.index.get_by_direction(
+                    direction=r.direction, x=r.x, y=r.y, distance=r.distance, lang=r.lang, compact=r.compact
+                )
+                for r in requests
+            ]
+        cls.check_occupancy(await cls.get_dataset_version())
+        async with AsyncSession(async_engine) as db:
+            lookups = [(r.direction, r.x, r.y, r.distance) for r in requests]
+            results = await hints_dao.get_by_directions(db=db, lookups=lookups)
+        data = []
+        for hints, r in zip(results, requests):
+            hints = cls._project(hints, r.lang, r.compact)
+            data.append(cls._group(hints, x=r.x, y=r.y) if r.direction == DirectionType.ALL else hints)
+        return data
+
+    @classmethod
+    async def get_nearest_hint(cls, request: HintNearestRequest) -> HintDetail | None:
+        x, y, direction, poi, lang = request.x, request.y, request.direction, request.poi, request.lang
+        if cls.index is not None:
+            return cls.index.get_nearest(direction=direction, x=x, y=y, poi=poi, lang=lang)
+        cls.check_occupancy(await cls.get_dataset_version())
+        async with AsyncSession(async_engine) as db:
+            hint = await hints_dao.get_nearest_by_poi(db=db, direction=direction, x=x, y=y, poi=poi)
+        if hint is None:
+            return None
+        return cls._project([hint], lang)[0]
+
     @staticmethod
-    async def get_hints(x: int, y: int, direction: DirectionType) -> list[Hint]:
+    async def export_hints(lang: LanguageType | None = None, compress: bool = False) -> AsyncIterator[bytes]:
+        """
+        Stream every hint as NDJSON, one object per line, in constant memory
+
+        :param lang: project hints on a single language
+        :param compress: gzip the stream
+        :return:
+        """
+        compressor = zlib.compressobj(settings.HUNT_HINTS_EXPORT_GZIP_LEVEL, wbits=31) if compress else None
         async with AsyncSession(async_engine) as db:
-            hints = await hints_dao.get_by_direction(db=db, direction=direction, x=x, y=y)
-            return list(hints)
+            async for rows in hints_dao.stream_columns(
+                db=db, lang=lang, batch_size=settings.HUNT_HINTS_EXPORT_BATCH_SIZE
+            ):
+                lines = [json.dumps(row._asdict(), ensure_ascii=False, separators=(',', ':')) for row in rows]
+                chunk = ('\n'.join(lines) + '\n').encode()
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    yield chunk
+        if compressor is not None:
+            yield compressor.flush()
+
+    @classmethod
+    async def get_tile_etag(cls, tx: int, ty: int) -> str:
+        """ETag of a tile, it only changes when the dataset is reloaded"""
+        version = await cls.get_served_version()
+        return make_etag(version, 'tile', TILE_VERSION, settings.HUNT_TILE_SIZE, tx, ty)
+
+    @classmethod
+    async def get_tile(cls, tx: int, ty: int) -> bytes:
+        """Get the encoded hints of a tile, generated once per dataset version"""
+        index = cls.index
+        version = await cls.get_served_version()
+        if version != cls.tiles_version:
+            cls.tiles, cls.tiles_version = {}, version
+        tile = cls.tiles.get((tx, ty))
+        if tile is not None:
+            return tile
+        size = settings.HUNT_TILE_SIZE
+        x0, y0, x1, y1 = tx * size, ty * size, (tx + 1) * size, (ty + 1) * size
+        if index is not None:
+            rows = [index.columns(i) for i in index.find_box(x0=x0, y0=y0, x1=x1, y1=y1)]
+        else:
+            async with AsyncSession(async_engine) as db:
+                rows = await hints_dao.get_columns_in_box(db=db, x0=x0, y0=y0, x1=x1, y1=y1)
+        tile = encode_tile(tx=tx, ty=ty, size=size, rows=rows)
+        if len(cls.tiles) < settings.HUNT_TILES_CACHE_MAX_SIZE:
+            cls.tiles[(tx, ty)] = tile
+        return tile
+
+    @classmethod
+    async def get_pois_etag(cls, lang: LanguageType) -> str:
+        """ETag of a POI catalogue, it only changes when the dataset is reloaded"""
+        version = await cls.get_served_version()
+        return make_etag(version, 'pois', lang.value)
+
+    @classmethod
+    async def get_pois(cls, lang: LanguageType) -> bytes:
+        """Get the JSON catalogue of POI names in a language keyed by POI id, built once per dataset version"""
+        version = await cls.get_served_version()
+        if version != cls.pois_version:
+            cls.pois, cls.pois_version = {}, version
+        catalogue = cls.pois.get(lang)
+        if catalogue is None:
+            async with AsyncSession(async_engine) as db:
+                rows = await poi_dao.get_names(db=db, lang=lang)
+            catalogue = json.dumps({row.id: row.name for row in rows}, ensure_ascii=False).encode()
+            cls.pois[lang] = catalogue
+        return catalogue
+
+    @classmethod
+    async def search_pois(cls, request: PoiSearchRequest) -> list[GetPoiSearchDetail]:
+        index = cls.search_index
+        if index is None or index.dataset_version != await cls.get_served_version():
+            # Not loaded at startup or the dataset moved on without a reload, concurrent lookups await one rebuild
+            if cls.search_task is None or cls.search_task.done():
+                cls.search_task = asyncio.create_task(cls.load_search_index())
+            await asyncio.shield(cls.search_task)
+            index = cls.search_index
+        matches = index.search(
+            request.q, limit=request.limit, min_similarity=settings.HUNT_SEARCH_MIN_SIMILARITY, lang=request.lang
+        )
+        return [
+            GetPoiSearchDetail(id=poi_id, lang=lang, name=name, score=round(score, 4))
+            for poi_id, lang, name, score in matches
+        ]
+
+    @staticmethod
+    def _projection_key(request: HintRequest) -> str:
+        if request.compact:
+            return 'compact'
+        return request.lang.value if request.lang else 'all'
+
+    @staticmethod
+    def _project(hints: list[Row], lang: LanguageType | None, compact: bool = False) -> HintList:
+        if compact:
+            return [(h.posX, h.posY, h.poi_id) for h in hints]
+        if lang is None:
+            return [GetHintDetail.model_validate(h) for h in hints]
+        field = f'hint_{lang.value}'
+        return [GetHintLangDetail(id=h.id, posX=h.posX, posY=h.posY, hint=getattr(h, field)) for h in hints]
+
+    @staticmethod
+    def _group(hints: HintList, x: int, y: int) -> dict[DirectionType, HintList]:
+        """Group hints sorted by distance from (x, y) by the direction they lie in"""
+        groups = {direction: [] for direction in DirectionType.moves()}
+        for hint in hints:
+            pos_x, pos_y = hint[:2] if isinstance(hint, tuple) else (hint.posX, hint.posY)
+            if pos_y == y:
+                groups[DirectionType.RIGHT if pos_x > x else DirectionType.LEFT].append(hint)
+            else:
+                groups[DirectionType.DOWN if pos_y > y else DirectionType.UP].append(hint)
+        return groups
@@ -13,10 +13,18 @@ from src.app.system.schema.user import (
     UpdateUserRoleParam,
 )
 from src.common.exception import errors
-from src.common.security.jwt import get_hash_password, get_token, password_verify, superuser_verify
+from src.common.security.jwt import (
+    bump_user_epoch,
+    get_hash_password,
+    get_token,
+    invalidate_user_cache,
+    password_verify,
+    revoke_user_sessions,
+    superuser_verify,
+)
+from src.common.security.session import session_store
 from src.core.conf import settings
 from src.database.db_postgres import async_db_session
-from src.database.db_redis import redis_client
 
 
 class UserService:
@@ -40,21 +48,15 @@ class UserService:
             user = await user_dao.get(db, request.user.id)
             if user is None:
                 raise errors.NotFoundError(msg='User does not exist')
-            if not password_verify(f'{obj.old_password}', user.password):
+            if not await password_verify(f'{obj.old_password}', user.password):
                 raise errors.ForbiddenError(msg='Incorrect old password')
             np1 = obj.new_password
             np2 = obj.confirm_password
             if np1 != np2:
                 raise errors.ForbiddenError(msg='Passwords do not match')
-            new_pwd = get_hash_password(f'{obj.new_password}', user.salt)
+            new_pwd = await get_hash_password(f'{obj.new_password}', user.salt)
             count = await user_dao.reset_password(db, request.user.id, new_pwd)
-            key_prefix = [
-                f'{settings.TOKEN_REDIS_PREFIX}:{request.user.id}',
-                f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{request.user.id}',
-                f'{settings.JWT_USER_REDIS_PREFIX}:{request.user.id}',
-            ]
-            for key in key_prefix:
-                await redis_client.delete_prefix(key)
+            await revoke_user_sessions(request.user.id)
             return count
 
     @staticmethod
@@ -83,7 +85,8 @@ class UserService:
                 if email:
                     raise errors.ForbiddenError(msg='Email already registered')
             count = await user_dao.update_userinfo(db, input_user.id, obj)
-            await redis_client.delete(f'{settings.JWT_USER_REDIS_PREFIX}:{request.user.id}')
+            await session_store.clear_user(request.user.id)
+            await invalidate_user_cache(request.user.id)
             return count
 
     @staticmethod
@@ -96,7 +99,8 @@ class UserService:
             if not input_user:
                 raise errors.NotFoundError(msg='User does not exist')
             await user_dao.update_role(db, input_user, obj)
-            await redis_client.delete(f'{settings.JWT_USER_REDIS_PREFIX}:{request.user.id}')
+            await session_store.clear_user(request.user.id)
+            await invalidate_user_cache(request.user.id)
 
     @staticmethod
     async def update_avatar(*, request: Request, username: str, avatar: AvatarParam) -> int:
@@ -108,7 +112,8 @@ class UserService:
             if not input_user:
                 raise errors.NotFoundError(msg='User does not exist')
             count = await user_dao.update_avatar(db, input_user.id, avatar)
-            await redis_client.delete(f'{settings.JWT_USER_REDIS_PREFIX}:{request.user.id}')
+            await session_store.clear_user(request.user.id)
+            await invalidate_user_cache(request.user.id)
             return count
 
     @staticmethod
@@ -130,7 +135,8 @@ class UserService:
                     raise errors.ForbiddenError(msg='Invalid operation')
                 super_status = await user_dao.get_super(db, pk)
                 count = await user_dao.set_super(db, pk, False if super_status else True)
-                await redis_client.delete(f'{settings.JWT_USER_REDIS_PREFIX}:{pk}')
+                await session_store.clear_user(pk)
+                await invalidate_user_cache(pk)
                 return count
 
     @staticmethod
@@ -144,7 +150,10 @@ class UserService:
                     raise errors.ForbiddenError(msg='Invalid operation')
                 status = await user_dao.get_status(db, pk)
                 count = await user_dao.set_status(db, pk, False if status else True)
-                await redis_client.delete(f'{settings.JWT_USER_REDIS_PREFIX}:{pk}')
+                await session_store.clear_user(pk)
+                # A locked user is only rejected on its next DB read, stateless tokens must be revoked
+                await bump_user_epoch(pk)
+                await invalidate_user_cache(pk)
                 return count
 
     @staticmethod
@@ -157,27 +166,21 @@ class UserService:
                 user_id = request.user.id
                 multi_login = await user_dao.get_multi_login(db, pk) if pk != user_id else request.user.is_multi_login
                 count = await user_dao.set_multi_login(db, pk, False if multi_login else True)
-                await redis_client.delete(f'{settings.JWT_USER_REDIS_PREFIX}:{request.user.id}')
+                await session_store.clear_user(request.user.id)
                 token = get_token(request)
                 latest_multi_login = await user_dao.get_multi_login(db, pk)
                 # When superuser modifies themselves, all tokens except current one become invalid
                 if pk == user_id:
                     if not latest_multi_login:
-                        key_prefix = f'{settings.TOKEN_REDIS_PREFIX}:{pk}'
-                        await redis_client.delete_prefix(key_prefix, exclude=f'{key_prefix}:{token}')
                         refresh_token = request.cookies.get(settings.COOKIE_REFRESH_TOKEN_KEY)
-                        if refresh_token:
-                            key_prefix = f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{pk}'
-                            await redis_client.delete_prefix(key_prefix, exclude=f'{key_prefix}:{refresh_token}')
+                        await session_store.revoke_others(pk, access_token=token, refresh_token=refresh_token)
                 # When superuser modifies others, all their tokens become invalid
                 else:
                     if not latest_multi_login:
-                        key_prefix = [f'{settings.TOKEN_REDIS_PREFIX}:{pk}']
-                        refresh_token = request.cookies.get(settings.COOKIE_REFRESH_TOKEN_KEY)
-                        if refresh_token:
-                            key_prefix.append(f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{pk}')
-                        for key in key_prefix:
-                            await redis_client.delete_prefix(key)
+                        await revoke_user_sessions(pk)
+                await invalidate_user_cache(user_id)
+                if pk != user_id:
+                    await invalidate_user_cache(pk)
                 return count
 
     @staticmethod
@@ -187,12 +190,7 @@ class UserService:
             if not input_user:
                 raise errors.NotFoundError(msg='User does not exist')
             count = await user_dao.delete(db, input_user.id)
-            key_prefix = [
-                f'{settings.TOKEN_REDIS_PREFIX}:{input_user.id}',
-                f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{input_user.id}',
-            ]
-            for key in key_prefix:
-                await redis_client.delete_prefix(key)
+            await revoke_user_sessions(input_user.id)
             return count
 
 
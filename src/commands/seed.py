@@ -1,4 +1,5 @@
 import asyncio
+import time
 
 import click
 
@@ -6,9 +7,11 @@ from fastapi import Request as FastAPIRequest
 from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette.datastructures import Headers
 
-from src.app.system.models.hints import Hint
+from src.app.system.crud.crud_hints import hints_dao
+from src.app.system.service.hunt_service import HuntService
 from src.app.system.service.user_service import user_service
-from src.common.loader import load_hints, load_super_admin
+from src.common.loader import iter_hints, load_super_admin
+from src.core.conf import settings
 from src.database.db_postgres import async_engine
 
 
@@ -28,11 +31,17 @@ class MockRequest(FastAPIRequest):
 
 @click.command()
 @click.option('--hints', is_flag=True, help='Seed hints')
-def seed(hints: bool):
+@click.option('--answers', is_flag=True, help='Precompute hint answers from the seeded hints')
+@click.option('--snapshot', is_flag=True, help='Rewrite the hint index snapshot from the seeded hints')
+def seed(hints: bool, answers: bool, snapshot: bool):
     """Seed the database with initial data"""
     if hints:
         asyncio.run(seed_hints())
-    else:
+    if snapshot:
+        asyncio.run(seed_snapshot())
+    if answers:
+        asyncio.run(seed_answers())
+    if not hints and not answers and not snapshot:
         asyncio.run(seed_super_admin())
 
 
@@ -50,31 +59,59 @@ async def seed_super_admin():
 
 async def seed_hints():
     try:
-        hints = load_hints()
-
+        start = time.perf_counter()
         async with AsyncSession(async_engine) as db:
-            id_counter = 1
-
-            for coord, pois in hints.items():
+            await hints_dao.create_staging(db)
+            # Translations are stored once per POI, hints only reference it
+            seen_pois: set[int] = set()
+            pois: list[tuple] = []
+            batch: list[tuple] = []
+            count = 0
+            for coord, coord_pois in iter_hints():
                 # Parse x,y from coordinate string
                 x, y = map(int, coord.split(','))
 
-                # For each POI at this coordinate
-                for poi in pois:
-                    id = id_counter
-                    names = poi['name']
-                    hint = Hint(
-                        id=id,
-                        posX=x,
-                        posY=y,
-                        hint_en=names.get('en', ''),
-                        hint_fr=names.get('fr', ''),
-                        hint_es=names.get('es', ''),
-                        hint_de=names.get('de', ''),
-                        hint_pt=names.get('pt', ''),
-                    )
-                    db.add(hint)
-                    id_counter += 1
+                # For each POI at this coordinate, ids follow the fixture order so a re-run upserts the same rows
+                for poi in coord_pois:
+                    if poi['id'] not in seen_pois:
+                        seen_pois.add(poi['id'])
+                        names = poi['name']
+                        pois.append((poi['id'], *(names.get(lang, '') for lang in ('fr', 'en', 'es', 'de', 'pt'))))
+                    count += 1
+                    batch.append((count, x, y, poi['id']))
+                if len(batch) >= settings.HUNT_SEED_BATCH_SIZE:
+                    await hints_dao.copy_to_staging(db, pois=pois, hints=batch)
+                    pois, batch = [], []
+                    click.echo(f'{count} hints staged')
+            await hints_dao.copy_to_staging(db, pois=pois, hints=batch)
+            click.echo(f'{count} hints staged, merging')
+            changed, deleted = await hints_dao.merge_staging(db)
             await db.commit()
+        await HuntService.bump_dataset_version()
+        click.echo(
+            f'{count} hints seeded with {len(seen_pois)} POIs in {time.perf_counter() - start:.1f}s '
+            f'({changed} inserted or changed, {deleted} removed)'
+        )
+    except Exception as e:
+        click.echo(f'Error seeding hints: {str(e)}', err=True)
+        return
+    await seed_snapshot()
+    if settings.HUNT_HINTS_ANSWERS_ENABLED:
+        # The answers file of the previous version is ignored from now on
+        await seed_answers()
+
+
+async def seed_snapshot():
+    try:
+        version = await HuntService.write_snapshot()
+        click.echo(f'Hint snapshot written for dataset version {version}')
+    except Exception as e:
+        click.echo(f'Error writing hint snapshot: {str(e)}', err=True)
+
+
+async def seed_answers():
+    try:
+        count = await HuntService.write_answers()
+        click.echo(f'{count} hint answers precomputed successfully!')
     except Exception as e:
-        click.echo(f'Error seeding case types: {str(e)}', err=True)
+        click.echo(f'Error precomputing hint answers: {str(e)}', err=True)
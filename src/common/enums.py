@@ -57,3 +57,19 @@ class DirectionType(StrEnum):
     DOWN = 'down'
     LEFT = 'left'
     RIGHT = 'right'
+    ALL = 'all'
+
+    @classmethod
+    def moves(cls) -> list['DirectionType']:
+        """Directions that move along the map, every member but ALL"""
+        return [cls.UP, cls.DOWN, cls.LEFT, cls.RIGHT]
+
+
+class LanguageType(StrEnum):
+    """Hint language"""
+
+    FR = 'fr'
+    EN = 'en'
+    ES = 'es'
+    DE = 'de'
+    PT = 'pt'
@@ -0,0 +1,154 @@
+import mmap
+import os
+import struct
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Sequence
+
+from src.common.enums import DirectionType
+from src.common.hint_index import HintIndex, StringTable
+
+# Directions of the answers, stored as their position in this tuple
+_DIRECTIONS = tuple(DirectionType.moves())
+
+# Fixed-width columns of an answers file and their array typecodes, in file order
+_COLUMNS = (
+    ('_dirs', 'b'),
+    ('_xs', 'q'),
+    ('_ys', 'q'),
+    ('_offsets', 'Q'),
+    ('_hints', 'I'),
+)
+
+# magic, format version, byte order mark, dataset version, section count
+_HEADER = struct.Struct('=4sHHQI')
+# offset, byte length
+_SECTION = struct.Struct('=QQ')
+_MAGIC = b'HANS'
+_FORMAT = 1
+_BOM = 0xFEFF
+_ALIGN = 8
+
+
+class HintAnswers:
+    """
+    Precomputed answers of every directional lookup at one distance, memory-mapped from a file
+
+    Lookups are sorted by (direction, posX, posY) and bisected. Each one holds a slice of hint numbers, and the
+    JSON of each hint is stored once in a string table, so an answer is the concatenation of the JSON of its hints.
+    The file is mapped read-only like the index snapshot, every worker of a host shares one page cache copy
+    """
+
+    # Dataset version the answers were written for
+    dataset_version: int | None = None
+
+    @classmethod
+    def open(cls, path: str) -> 'HintAnswers':
+        """
+        Map an answers file read-only, answers are served straight from the page cache without copying
+
+        :param path:
+        :return:
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(mapped)
+        magic, version, bom, dataset_version, count = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or version != _FORMAT or bom != _BOM:
+            raise ValueError(f'Unsupported hint answers file {path}')
+        if count != len(_COLUMNS) + 2:
+            raise ValueError(f'Corrupted hint answers file {path}')
+        sections = []
+        for n in range(count):
+            start, length = _SECTION.unpack_from(buffer, _HEADER.size + n * _SECTION.size)
+            sections.append(buffer[start : start + length])
+
+        answers = cls.__new__(cls)
+        for (name, typecode), section in zip(_COLUMNS, sections):
+            setattr(answers, name, section.cast(typecode))
+        answers._json = StringTable(sections[-1], sections[-2].cast('Q'))
+        answers._mmap = mapped
+        answers.dataset_version = dataset_version
+        answers.size = len(answers._dirs)
+        return answers
+
+    @staticmethod
+    def write(path: str, index: HintIndex, distance: int, dataset_version: int) -> int:
+        """
+        Precompute the answers of an index and write them, replacing any previous file atomically
+
+        Layout, in native byte order: a header, a table of (offset, byte length) per section, then the sections
+        aligned on 8 bytes, one per fixed-width column followed by the offsets and blob of the hint JSON
+
+        :param path:
+        :param index:
+        :param distance: cells searched by the answered lookups
+        :param dataset_version:
+        :return: number of lookups answered
+        """
+        entries = sorted(
+            (_DIRECTIONS.index(direction), x, y, found)
+            for direction, x, y, found in index.iter_answers(distance=distance)
+        )
+        dirs, xs, ys = array('b'), array('q'), array('q')
+        offsets, hints = array('Q', [0]), array('I')
+        for d, x, y, found in entries:
+            dirs.append(d)
+            xs.append(x)
+            ys.append(y)
+            hints.extend(int(i) for i in found)
+            offsets.append(len(hints))
+
+        blob, json_offsets = StringTable.pack([index.get(i).model_dump_json() for i in range(index.size)])
+        sections = [memoryview(column).cast('B') for column in (dirs, xs, ys, offsets, hints)]
+        sections.extend((memoryview(json_offsets).cast('B'), blob))
+
+        offset = _HEADER.size + _SECTION.size * len(sections)
+        table = []
+        for section in sections:
+            offset += -offset % _ALIGN
+            table.append((offset, len(section)))
+            offset += len(section)
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _FORMAT, _BOM, dataset_version, len(table)))
+            for entry in table:
+                f.write(_SECTION.pack(*entry))
+            for (start, _), section in zip(table, sections):
+                f.write(b'\0' * (start - f.tell()))
+                f.write(section)
+        # Workers that mapped the previous file keep reading its unlinked inode
+        os.replace(tmp_path, path)
+        return len(dirs)
+
+    def find(self, direction: DirectionType, x: int, y: int) -> Sequence[int]:
+        """
+        Get the hint numbers answering a lookup, nearest first
+
+        :param direction:
+        :param x:
+        :param y:
+        :return:
+        """
+        d = _DIRECTIONS.index(direction)
+        lo = bisect_left(self._dirs, d)
+        hi = bisect_right(self._dirs, d, lo)
+        lo = bisect_left(self._xs, x, lo, hi)
+        hi = bisect_right(self._xs, x, lo, hi)
+        k = bisect_left(self._ys, y, lo, hi)
+        if k == hi or self._ys[k] != y:
+            return ()
+        return self._hints[self._offsets[k] : self._offsets[k + 1]]
+
+    def get(self, direction: DirectionType, x: int, y: int) -> bytes:
+        """
+        Get the JSON answer of a lookup
+
+        :param direction:
+        :param x:
+        :param y:
+        :return: JSON array of hints
+        """
+        return b'[' + b','.join(self._json.get_bytes(h) for h in self.find(direction=direction, x=x, y=y)) + b']'
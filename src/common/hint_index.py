@@ -0,0 +1,466 @@
+import mmap
+import os
+import struct
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, Iterator, Sequence
+
+from src.app.system.schema.hints import (
+    CompactHint,
+    GetHintDetail,
+    GetHintLangDetail,
+    HintDetail,
+    HintList,
+    HintResult,
+)
+from src.common.enums import DirectionType, LanguageType
+
+# Translation columns, in the order rows are handed to the index
+HINT_NAME_FIELDS = ('hint_fr', 'hint_en', 'hint_es', 'hint_de', 'hint_pt')
+
+# Fixed-width columns of an index and their array typecodes, in snapshot file order
+_COLUMNS = (
+    ('_ids', 'q'),
+    ('_xs', 'i'),
+    ('_ys', 'i'),
+    ('_pois', 'q'),
+    ('_names', 'I'),
+    ('_row_order', 'i'),
+    ('_row_ys', 'i'),
+    ('_row_xs', 'i'),
+    ('_col_order', 'i'),
+    ('_col_xs', 'i'),
+    ('_col_ys', 'i'),
+    ('_poi_row_ids', 'q'),
+    ('_poi_row_ys', 'i'),
+    ('_poi_row_xs', 'i'),
+    ('_poi_row_order', 'i'),
+    ('_poi_col_ids', 'q'),
+    ('_poi_col_xs', 'i'),
+    ('_poi_col_ys', 'i'),
+    ('_poi_col_order', 'i'),
+    ('_poi_name_keys', 'i'),
+    ('_poi_name_ids', 'q'),
+)
+# String tables of an index, each stored as offsets and a UTF-8 blob
+_STRING_TABLES = ('_strings', '_poi_keys')
+
+# magic, format version, byte order mark, dataset version, section count
+_SNAPSHOT_HEADER = struct.Struct('=4sHHQI')
+# offset, byte length
+_SNAPSHOT_SECTION = struct.Struct('=QQ')
+_SNAPSHOT_MAGIC = b'HSNP'
+_SNAPSHOT_FORMAT = 3
+_SNAPSHOT_BOM = 0xFEFF
+_SNAPSHOT_ALIGN = 8
+
+
+def poi_key(name: str) -> str:
+    """Normalize a POI name for lookups, any translation matches regardless of case"""
+    return name.strip().lower()
+
+
+class StringTable(Sequence[str]):
+    """Strings stored back to back in a UTF-8 blob, string k spans offsets[k]:offsets[k + 1]"""
+
+    def __init__(self, blob: bytes | memoryview, offsets: Sequence[int]):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, k: int) -> str:
+        return self.get_bytes(k).decode()
+
+    def get_bytes(self, k: int) -> bytes:
+        """String k still UTF-8 encoded"""
+        return bytes(self._blob[self._offsets[k] : self._offsets[k + 1]])
+
+    @staticmethod
+    def pack(strings: Sequence[str]) -> tuple[bytes, array]:
+        """
+        Pack strings into a blob and its offsets
+
+        :param strings:
+        :return:
+        """
+        offsets = array('Q', [0])
+        chunks = []
+        for string in strings:
+            chunk = string.encode()
+            chunks.append(chunk)
+            offsets.append(offsets[-1] + len(chunk))
+        return b''.join(chunks), offsets
+
+
+class HintIndex:
+    """
+    Read-only columnar in-memory store of hints
+
+    Coordinates live in fixed-width arrays addressed by row index, translations in a string table where
+    repeated POI names share a single entry. Two sorted permutations, by (posY, posX) and by (posX, posY),
+    turn a directional window into a contiguous slice found with bisect lookups. Two more, by (poi_id, posY, posX)
+    and by (poi_id, posX, posY), answer nearest-POI lookups at any distance with bisect lookups, POI names are
+    resolved to their poi_ids first.
+
+    Every column is a flat array, so the whole index can be written to a snapshot file and mapped back
+    read-only, letting all workers of a host share one page cache copy
+    """
+
+    # Dataset version the index was built for, only known for snapshots
+    dataset_version: int | None = None
+
+    def __init__(self, rows: Iterable[Sequence[Any]]):
+        """
+        :param rows: (id, posX, posY, poi_id, hint_fr, hint_en, hint_es, hint_de, hint_pt) tuples
+        """
+        self._ids = array('q')
+        self._xs = array('i')
+        self._ys = array('i')
+        self._pois = array('q')
+        # String ids of the translations of each row, len(HINT_NAME_FIELDS) per row
+        self._names = array('I')
+        string_ids: dict[str, int] = {}
+        for pk, x, y, poi_id, *translations in rows:
+            self._ids.append(pk)
+            self._xs.append(x)
+            self._ys.append(y)
+            self._pois.append(poi_id)
+            self._names.extend(string_ids.setdefault(name, len(string_ids)) for name in translations)
+        self._strings: Sequence[str] = list(string_ids)
+
+        xs, ys = self._xs, self._ys
+        by_row = sorted(range(len(xs)), key=lambda i: (ys[i], xs[i]))
+        self._row_order = array('i', by_row)
+        self._row_ys = array('i', (ys[i] for i in by_row))
+        self._row_xs = array('i', (xs[i] for i in by_row))
+        by_col = sorted(range(len(xs)), key=lambda i: (xs[i], ys[i]))
+        self._col_order = array('i', by_col)
+        self._col_xs = array('i', (xs[i] for i in by_col))
+        self._col_ys = array('i', (ys[i] for i in by_col))
+
+        pois = self._pois
+        by_poi_row = sorted((pois[i], ys[i], xs[i], i) for i in range(len(xs)))
+        self._poi_row_ids, self._poi_row_ys, self._poi_row_xs, self._poi_row_order = (
+            array(typecode, column) for typecode, column in zip('qiii', self._unzip(by_poi_row, 4))
+        )
+        by_poi_col = sorted((pois[i], xs[i], ys[i], i) for i in range(len(xs)))
+        self._poi_col_ids, self._poi_col_xs, self._poi_col_ys, self._poi_col_order = (
+            array(typecode, column) for typecode, column in zip('qiii', self._unzip(by_poi_col, 4))
+        )
+
+        # Every normalized POI name with the poi_ids it names, sorted by name
+        self._poi_keys: Sequence[str] = sorted({poi_key(string) for string in self._strings})
+        key_ids = {key: k for k, key in enumerate(self._poi_keys)}
+        string_keys = [key_ids[poi_key(string)] for string in self._strings]
+        width = len(HINT_NAME_FIELDS)
+        by_name = sorted(
+            {(string_keys[s], pois[i]) for i in range(len(xs)) for s in self._names[i * width : (i + 1) * width]}
+        )
+        self._poi_name_keys, self._poi_name_ids = (
+            array(typecode, column) for typecode, column in zip('iq', self._unzip(by_name, 2))
+        )
+
+        self.size = len(self._ids)
+
+    def write_snapshot(self, path: str, dataset_version: int) -> None:
+        """
+        Write the index to a snapshot file, replacing any previous snapshot atomically
+
+        Layout, in native byte order: a header, a table of (offset, byte length) per section, then the sections
+        aligned on 8 bytes, one per fixed-width column followed by the offsets and blob of each string table
+
+        :param path:
+        :param dataset_version:
+        :return:
+        """
+        sections: list[bytes | memoryview] = [memoryview(getattr(self, name)).cast('B') for name, _ in _COLUMNS]
+        for name in _STRING_TABLES:
+            blob, offsets = StringTable.pack(getattr(self, name))
+            sections.extend((memoryview(offsets).cast('B'), blob))
+
+        offset = _SNAPSHOT_HEADER.size + _SNAPSHOT_SECTION.size * len(sections)
+        table = []
+        for section in sections:
+            offset += -offset % _SNAPSHOT_ALIGN
+            table.append((offset, len(section)))
+            offset += len(section)
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(
+                _SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_FORMAT, _SNAPSHOT_BOM, dataset_version, len(table))
+            )
+            for entry in table:
+                f.write(_SNAPSHOT_SECTION.pack(*entry))
+            for (start, _), section in zip(table, sections):
+                f.write(b'\0' * (start - f.tell()))
+                f.write(section)
+        # Workers that mapped the previous snapshot keep reading its unlinked inode
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open_snapshot(cls, path: str) -> 'HintIndex':
+        """
+        Map a snapshot file read-only, columns are served straight from the page cache without copying
+
+        :param path:
+        :return:
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(mapped)
+        magic, version, bom, dataset_version, count = _SNAPSHOT_HEADER.unpack_from(buffer)
+        if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_FORMAT or bom != _SNAPSHOT_BOM:
+            raise ValueError(f'Unsupported hint snapshot {path}')
+        if count != len(_COLUMNS) + 2 * len(_STRING_TABLES):
+            raise ValueError(f'Corrupted hint snapshot {path}')
+        sections = []
+        for n in range(count):
+            start, length = _SNAPSHOT_SECTION.unpack_from(buffer, _SNAPSHOT_HEADER.size + n * _SNAPSHOT_SECTION.size)
+            sections.append(buffer[start : start + length])
+
+        index = cls.__new__(cls)
+        for (name, typecode), section in zip(_COLUMNS, sections):
+            setattr(index, name, section.cast(typecode))
+        tables = sections[len(_COLUMNS) :]
+        for n, name in enumerate(_STRING_TABLES):
+            setattr(index, name, StringTable(tables[2 * n + 1], tables[2 * n].cast('Q')))
+        index._mmap = mapped
+        index.dataset_version = dataset_version
+        index.size = len(index._ids)
+        return index
+
+    def get_by_direction(
+        self,
+        direction: DirectionType,
+        x: int,
+        y: int,
+        distance: int = 10,
+        lang: LanguageType | None = None,
+        compact: bool = False,
+    ) -> HintResult:
+        """
+        Get hints within distance of (x, y) in the given direction, sorted by distance
+
+        :param direction: ALL groups hints by direction
+        :param x:
+        :param y:
+        :param distance:
+        :param lang: project hints on a single language
+        :param compact: return (posX, posY, poi_id) tuples, takes precedence over lang
+        :return:
+        """
+        if direction == DirectionType.ALL:
+            return {d: self._get_line(d, x, y, distance, lang, compact) for d in DirectionType.moves()}
+        return self._get_line(direction, x, y, distance, lang, compact)
+
+    def _get_line(
+        self, direction: DirectionType, x: int, y: int, distance: int, lang: LanguageType | None, compact: bool
+    ) -> HintList:
+        found = self.find(direction=direction, x=x, y=y, distance=distance)
+        if compact:
+            return [self.get_compact(i) for i in found]
+        if lang is None:
+            return [self.get(i) for i in found]
+        return [self.get_lang(i, lang) for i in found]
+
+    def find(self, direction: DirectionType, x: int, y: int, distance: int = 10) -> Sequence[int]:
+        """
+        Get row indexes of hints within distance of (x, y) in the given direction, nearest first
+
+        :param direction:
+        :param x:
+        :param y:
+        :param distance:
+        :return:
+        """
+        if direction == DirectionType.RIGHT:
+            return self._window(self._row_order, self._row_ys, self._row_xs, y, x, x + distance, right=True)
+        elif direction == DirectionType.LEFT:
+            return self._window(self._row_order, self._row_ys, self._row_xs, y, x - distance, x, right=False)
+        elif direction == DirectionType.UP:
+            return self._window(self._col_order, self._col_xs, self._col_ys, x, y - distance, y, right=False)
+        elif direction == DirectionType.DOWN:
+            return self._window(self._col_order, self._col_xs, self._col_ys, x, y, y + distance, right=True)
+        else:
+            raise ValueError('Invalid direction')
+
+    def find_nearest(self, direction: DirectionType, x: int, y: int, poi: int | str) -> int | None:
+        """
+        Get the row index of the nearest hint for a POI in the given direction, at any distance
+
+        :param direction:
+        :param x:
+        :param y:
+        :param poi: poi_id, or POI name in any language
+        :return:
+        """
+        if direction in (DirectionType.RIGHT, DirectionType.LEFT):
+            ids, major, minor, order = self._poi_row_ids, self._poi_row_ys, self._poi_row_xs, self._poi_row_order
+            line, position = y, x
+        elif direction in (DirectionType.UP, DirectionType.DOWN):
+            ids, major, minor, order = self._poi_col_ids, self._poi_col_xs, self._poi_col_ys, self._poi_col_order
+            line, position = x, y
+        else:
+            raise ValueError('Invalid direction')
+        nearest = None
+        for poi_id in [poi] if isinstance(poi, int) else self._named_pois(poi):
+            lo = bisect_left(ids, poi_id)
+            hi = bisect_right(ids, poi_id, lo)
+            lo = bisect_left(major, line, lo, hi)
+            hi = bisect_right(major, line, lo, hi)
+            if direction in (DirectionType.RIGHT, DirectionType.DOWN):
+                j = bisect_right(minor, position, lo, hi)
+                found = j < hi
+            else:
+                j = bisect_left(minor, position, lo, hi) - 1
+                found = j >= lo
+            if found and (nearest is None or abs(minor[j] - position) < abs(minor[nearest] - position)):
+                nearest = j
+        return None if nearest is None else order[nearest]
+
+    def _named_pois(self, name: str) -> Sequence[int]:
+        """poi_ids of the POIs with a name in any language, case-insensitive"""
+        key = poi_key(name)
+        k = bisect_left(self._poi_keys, key)
+        if k == len(self._poi_keys) or self._poi_keys[k] != key:
+            return ()
+        lo = bisect_left(self._poi_name_keys, k)
+        return self._poi_name_ids[lo : bisect_right(self._poi_name_keys, k, lo)]
+
+    def get_nearest(
+        self, direction: DirectionType, x: int, y: int, poi: int | str, lang: LanguageType | None = None
+    ) -> HintDetail | None:
+        """
+        Get the nearest hint for a POI in the given direction, at any distance
+
+        :param direction:
+        :param x:
+        :param y:
+        :param poi: poi_id, or POI name in any language
+        :param lang: project the hint on a single language
+        :return:
+        """
+        i = self.find_nearest(direction=direction, x=x, y=y, poi=poi)
+        if i is None:
+            return None
+        return self.get(i) if lang is None else self.get_lang(i, lang)
+
+    def find_box(self, x0: int, y0: int, x1: int, y1: int) -> list[int]:
+        """
+        Get row indexes of hints with x0 <= posX < x1 and y0 <= posY < y1, sorted by (posY, posX)
+
+        :param x0:
+        :param y0:
+        :param x1:
+        :param y1:
+        :return:
+        """
+        found: list[int] = []
+        lo = bisect_left(self._row_ys, y0)
+        end = bisect_left(self._row_ys, y1, lo)
+        while lo < end:
+            hi = bisect_right(self._row_ys, self._row_ys[lo], lo, end)
+            found.extend(self._row_order[bisect_left(self._row_xs, x0, lo, hi) : bisect_left(self._row_xs, x1, lo, hi)])
+            lo = hi
+        return found
+
+    def iter_answers(self, distance: int = 10) -> Iterator[tuple[DirectionType, int, int, Sequence[int]]]:
+        """
+        Iterate over every (direction, x, y) lookup with a non-empty answer, every other lookup answers nothing
+
+        :param distance:
+        :return: (direction, x, y, row indexes) tuples
+        """
+        # Step from a hint back to the cells whose window contains it
+        steps = {
+            DirectionType.RIGHT: (-1, 0),
+            DirectionType.LEFT: (1, 0),
+            DirectionType.UP: (0, 1),
+            DirectionType.DOWN: (0, -1),
+        }
+        for direction, (dx, dy) in steps.items():
+            cells = {
+                (x + dx * step, y + dy * step) for x, y in zip(self._xs, self._ys) for step in range(1, distance + 1)
+            }
+            for x, y in sorted(cells):
+                yield direction, x, y, self.find(direction=direction, x=x, y=y, distance=distance)
+
+    def get(self, i: int) -> GetHintDetail:
+        """
+        Materialize the hint stored at a row index
+
+        :param i:
+        :return:
+        """
+        return GetHintDetail(
+            id=self._ids[i], posX=self._xs[i], posY=self._ys[i], **dict(zip(HINT_NAME_FIELDS, self._row_names(i)))
+        )
+
+    def columns(self, i: int) -> tuple[Any, ...]:
+        """
+        Get the hint stored at a row index as a plain column tuple
+
+        :param i:
+        :return: (id, posX, posY, poi_id, hint_fr, hint_en, hint_es, hint_de, hint_pt)
+        """
+        return self._ids[i], self._xs[i], self._ys[i], self._pois[i], *self._row_names(i)
+
+    def get_compact(self, i: int) -> CompactHint:
+        """
+        Get the hint stored at a row index as a (posX, posY, poi_id) tuple
+
+        :param i:
+        :return:
+        """
+        return self._xs[i], self._ys[i], self._pois[i]
+
+    def get_lang(self, i: int, lang: LanguageType) -> GetHintLangDetail:
+        """
+        Materialize the hint stored at a row index, projected on a single language
+
+        :param i:
+        :param lang:
+        :return:
+        """
+        field = HINT_NAME_FIELDS.index(f'hint_{lang.value}')
+        hint = self._strings[self._names[i * len(HINT_NAME_FIELDS) + field]]
+        return GetHintLangDetail(id=self._ids[i], posX=self._xs[i], posY=self._ys[i], hint=hint)
+
+    def _row_names(self, i: int) -> list[str]:
+        width = len(HINT_NAME_FIELDS)
+        return [self._strings[s] for s in self._names[i * width : (i + 1) * width]]
+
+    @staticmethod
+    def _unzip(entries: list[tuple[int, ...]], width: int) -> list[Sequence[int]]:
+        if not entries:
+            return [() for _ in range(width)]
+        return list(zip(*entries))
+
+    @staticmethod
+    def _window(
+        order: Sequence[int], major: Sequence[int], minor: Sequence[int], line: int, start: int, end: int, right: bool
+    ) -> Sequence[int]:
+        """
+        Slice one row or column of a sorted permutation, (start, end] when looking right/down,
+        [start, end) reversed otherwise, so the nearest hint always comes first
+
+        :param order: permutation of row indexes
+        :param major: sorted line coordinate of each permutation entry
+        :param minor: coordinate along the line, sorted within each line
+        :param line:
+        :param start:
+        :param end:
+        :param right:
+        :return:
+        """
+        lo = bisect_left(major, line)
+        hi = bisect_right(major, line, lo)
+        if lo == hi:
+            return ()
+        if right:
+            return order[bisect_right(minor, start, lo, hi) : bisect_right(minor, end, lo, hi)]
+        return order[bisect_left(minor, start, lo, hi) : bisect_left(minor, end, lo, hi)][::-1]
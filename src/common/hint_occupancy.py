@@ -0,0 +1,81 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable
+
+from src.common.enums import DirectionType
+
+
+class Axis:
+    """Occupied coordinates on one axis as a sorted array, memory follows the number of coordinates, not their range"""
+
+    def __init__(self, coordinates: Iterable[int]):
+        self._coordinates = array('q', sorted(set(coordinates)))
+        self.min = self._coordinates[0] if self._coordinates else 0
+        self.max = self._coordinates[-1] if self._coordinates else -1
+
+    def __contains__(self, c: int) -> bool:
+        return self.any(c, c)
+
+    def any(self, lo: int, hi: int) -> bool:
+        """
+        Whether any coordinate in [lo, hi] is occupied, in O(log n)
+
+        :param lo:
+        :param hi:
+        :return:
+        """
+        i = bisect_left(self._coordinates, lo)
+        return i < len(self._coordinates) and self._coordinates[i] <= hi
+
+
+class HintOccupancy:
+    """
+    Occupied rows and columns of the map with its bounding box
+
+    A lookup can only find hints when its own row (or column) is occupied and so is at least one column
+    (or row) of its window, anything else is answered empty without a query
+    """
+
+    # Dataset version the occupancy was built for, its shortcuts are only valid for that version
+    dataset_version: int | None = None
+
+    def __init__(self, xs: Iterable[int], ys: Iterable[int]):
+        """
+        :param xs: posX of the hints, or of the occupied columns
+        :param ys: posY of the hints, or of the occupied rows
+        """
+        self.columns = Axis(xs)
+        self.rows = Axis(ys)
+
+    @property
+    def bounds(self) -> tuple[int, int, int, int]:
+        """Bounding box of the hints as (min x, min y, max x, max y), empty when min > max"""
+        return self.columns.min, self.rows.min, self.columns.max, self.rows.max
+
+    def may_have_hints(self, direction: DirectionType, x: int, y: int, distance: int | None = None) -> bool:
+        """
+        Whether a lookup can find hints, False only when it certainly finds none
+
+        :param direction:
+        :param x:
+        :param y:
+        :param distance: cells searched, None for no bound
+        :return:
+        """
+        if distance is None:
+            # Far enough to cross the whole bounding box from anywhere inside or outside of it
+            distance = max(
+                abs(x - self.columns.min), abs(x - self.columns.max), abs(y - self.rows.min), abs(y - self.rows.max)
+            )
+        if direction == DirectionType.RIGHT:
+            return y in self.rows and self.columns.any(x + 1, x + distance)
+        elif direction == DirectionType.LEFT:
+            return y in self.rows and self.columns.any(x - distance, x - 1)
+        elif direction == DirectionType.UP:
+            return x in self.columns and self.rows.any(y - distance, y - 1)
+        elif direction == DirectionType.DOWN:
+            return x in self.columns and self.rows.any(y + 1, y + distance)
+        elif direction == DirectionType.ALL:
+            return any(self.may_have_hints(d, x=x, y=y, distance=distance) for d in DirectionType.moves())
+        else:
+            raise ValueError('Invalid direction')
@@ -0,0 +1,136 @@
+import struct
+
+from typing import Any, Iterable, Sequence
+
+from src.common.hint_index import HINT_NAME_FIELDS
+
+# magic, format version, tile size, tx, ty, hint count, POI dictionary size
+_HEADER = struct.Struct('<4sBHiiII')
+TILE_MAGIC = b'HTIL'
+TILE_VERSION = 2
+
+
+def tile_of(x: int, y: int, size: int) -> tuple[int, int]:
+    """
+    Get the tile containing a cell, tile (tx, ty) covers [tx * size, (tx + 1) * size) on both axes
+
+    :param x:
+    :param y:
+    :param size:
+    :return:
+    """
+    return x // size, y // size
+
+
+def encode_tile(tx: int, ty: int, size: int, rows: Iterable[Sequence[Any]]) -> bytes:
+    """
+    Encode the hints of a tile in a compact binary form
+
+    Layout, integers little-endian and varints unsigned LEB128:
+
+    - header: magic ``HTIL``, u8 format version, u16 tile size, i32 tx, i32 ty, u32 hint count, u32 POI count
+    - POI dictionary: per POI, its varint id then its translations in ``HINT_NAME_FIELDS`` order, each a varint
+      byte length then UTF-8
+    - hints sorted by (posY, posX): varint posY delta from the previous hint (the tile top for the first one),
+      varint posX delta from the previous hint on the same row (the tile left edge on a new row),
+      zigzag varint id delta from the previous hint, varint POI dictionary index
+
+    :param tx:
+    :param ty:
+    :param size:
+    :param rows: (id, posX, posY, poi_id, hint_fr, hint_en, hint_es, hint_de, hint_pt) tuples inside the tile
+    :return:
+    """
+    rows = sorted(rows, key=lambda row: (row[2], row[1]))
+    pois: dict[int, int] = {}
+    translations_by_poi: list[tuple[int, Sequence[str]]] = []
+    records = bytearray()
+    left, top = tx * size, ty * size
+    prev_id, prev_x, prev_y = 0, left, top
+    for pk, x, y, poi_id, *translations in rows:
+        poi = pois.get(poi_id)
+        if poi is None:
+            poi = pois[poi_id] = len(pois)
+            translations_by_poi.append((poi_id, translations))
+        if y != prev_y:
+            prev_x = left
+        _write_varint(records, y - prev_y)
+        _write_varint(records, x - prev_x)
+        _write_varint(records, _zigzag(pk - prev_id))
+        _write_varint(records, poi)
+        prev_id, prev_x, prev_y = pk, x, y
+
+    dictionary = bytearray()
+    for poi_id, translations in translations_by_poi:
+        _write_varint(dictionary, poi_id)
+        for name in translations:
+            encoded = name.encode()
+            _write_varint(dictionary, len(encoded))
+            dictionary += encoded
+
+    header = _HEADER.pack(TILE_MAGIC, TILE_VERSION, size, tx, ty, len(rows), len(pois))
+    return b''.join((header, dictionary, records))
+
+
+def decode_tile(data: bytes) -> tuple[int, int, int, list[tuple[Any, ...]]]:
+    """
+    Decode a tile produced by encode_tile, the reference for client implementations
+
+    :param data:
+    :return: (tx, ty, size, rows) with rows as (id, posX, posY, poi_id, hint_fr, hint_en, hint_es, hint_de, hint_pt)
+    """
+    magic, version, size, tx, ty, count, poi_count = _HEADER.unpack_from(data)
+    if magic != TILE_MAGIC or version != TILE_VERSION:
+        raise ValueError('Unsupported tile format')
+    pos = _HEADER.size
+    pois = []
+    for _ in range(poi_count):
+        poi_id, pos = _read_varint(data, pos)
+        columns = [poi_id]
+        for _ in HINT_NAME_FIELDS:
+            length, pos = _read_varint(data, pos)
+            columns.append(data[pos : pos + length].decode())
+            pos += length
+        pois.append(tuple(columns))
+
+    rows = []
+    left, top = tx * size, ty * size
+    pk, x, y = 0, left, top
+    for _ in range(count):
+        dy, pos = _read_varint(data, pos)
+        dx, pos = _read_varint(data, pos)
+        did, pos = _read_varint(data, pos)
+        poi, pos = _read_varint(data, pos)
+        if dy:
+            x = left
+        y += dy
+        x += dx
+        pk += _unzigzag(did)
+        rows.append((pk, x, y, *pois[poi]))
+    return tx, ty, size, rows
+
+
+def _zigzag(n: int) -> int:
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def _unzigzag(n: int) -> int:
+    return n // 2 if n % 2 == 0 else -(n + 1) // 2
+
+
+def _write_varint(buf: bytearray, n: int) -> None:
+    while n >= 0x80:
+        buf.append(n & 0x7F | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
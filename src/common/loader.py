@@ -1,6 +1,6 @@
 import json
 
-from typing import Dict, List, TypedDict
+from typing import Any, Iterator, List, TextIO, Tuple, TypedDict
 
 from src.app.system.schema.user import AddSuperAdminParam
 from src.core.conf import settings
@@ -38,12 +38,72 @@ def load_super_admin() -> AddSuperAdminParam:
     )
 
 
-def load_hints() -> Dict[str, List[PointOfInterest]]:
+def iter_hints(chunk_size: int = 1 << 16) -> Iterator[Tuple[str, List[PointOfInterest]]]:
+    """
+    Stream the hints fixture one coordinate at a time instead of loading the whole document
+
+    :param chunk_size: characters read from the file at a time
+    :return: ("x,y", POIs) pairs in file order
+    """
     try:
-        hints = json.load(open('src/fixtures/treasure_hunt_pois.json'))
+        f = open('src/fixtures/treasure_hunt_pois.json', encoding='utf-8')
     except FileNotFoundError:
         raise Exception('Hints file not found')
-    except Exception as e:
-        raise Exception(f'Failed to load hints: {str(e)}')
+    with f:
+        try:
+            yield from _iter_object_items(f, chunk_size)
+        except ValueError as e:
+            raise Exception(f'Failed to load hints: {str(e)}')
+
+
+def _iter_object_items(f: TextIO, chunk_size: int) -> Iterator[Tuple[str, Any]]:
+    """Incrementally decode the members of a top-level JSON object"""
+    decoder = json.JSONDecoder()
+    buf, pos, eof = '', 0, False
+
+    def skip(expected: str) -> str:
+        # Skip whitespace and return the next character, reading more of the file when needed
+        nonlocal buf, pos, eof
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf):
+                char = buf[pos]
+                if char not in expected:
+                    raise ValueError(f'Expecting one of {expected!r} at character {pos}, got {char!r}')
+                pos += 1
+                return char
+            if eof:
+                raise ValueError('Unexpected end of file')
+            buf, pos = f.read(chunk_size), 0
+            eof = not buf
+
+    def decode() -> Any:
+        # A value ending with the buffer may be truncated (e.g. a number), it is only final at end of file
+        nonlocal buf, pos, eof
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                if end < len(buf) or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            chunk = f.read(chunk_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
 
-    return hints
+    skip('{')
+    if skip('"}') == '}':
+        return
+    while True:
+        # Step back onto the opening quote of the key
+        pos -= 1
+        key = decode()
+        skip(':')
+        yield key, decode()
+        if skip(',}') == '}':
+            return
+        skip('"')
@@ -0,0 +1,107 @@
+import heapq
+import unicodedata
+
+from array import array
+from collections import Counter
+from typing import Any, Iterable, Sequence
+
+from src.common.enums import LanguageType
+
+# Languages of the name columns, in the order rows are handed to the index
+POI_NAME_LANGUAGES = (LanguageType.FR, LanguageType.EN, LanguageType.ES, LanguageType.DE, LanguageType.PT)
+
+
+def normalize(text: str) -> list[str]:
+    """
+    Split a name into accent-free, case-folded words
+
+    :param text:
+    :return:
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return ''.join(c if c.isalnum() else ' ' for c in stripped).split()
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Get the trigrams of a name, each word padded like pg_trgm does
+
+    :param text:
+    :return:
+    """
+    grams = set()
+    for word in normalize(text):
+        padded = f'  {word} '
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class PoiSearchIndex:
+    """
+    Read-only trigram inverted index over POI names in every language
+
+    Each (POI, language) name is an entry, every trigram maps to the entries containing it. A query
+    only visits the entries sharing at least one trigram with it, ranked by trigram similarity
+    """
+
+    # Dataset version the index was built for
+    dataset_version: int | None = None
+
+    def __init__(self, rows: Iterable[Sequence[Any]]):
+        """
+        :param rows: (poi_id, name_fr, name_en, name_es, name_de, name_pt) tuples
+        """
+        self._pois = array('q')
+        self._langs: list[LanguageType] = []
+        self._names: list[str] = []
+        self._sizes = array('I')
+        postings: dict[str, list[int]] = {}
+        for poi_id, *names in rows:
+            for lang, name in zip(POI_NAME_LANGUAGES, names):
+                grams = trigrams(name)
+                if not grams:
+                    continue
+                entry = len(self._names)
+                self._pois.append(poi_id)
+                self._langs.append(lang)
+                self._names.append(name)
+                self._sizes.append(len(grams))
+                for gram in grams:
+                    postings.setdefault(gram, []).append(entry)
+        self._postings = {gram: array('I', entries) for gram, entries in postings.items()}
+
+        self.size = len(self._names)
+
+    def search(
+        self, query: str, limit: int = 10, min_similarity: float = 0.3, lang: LanguageType | None = None
+    ) -> list[tuple[int, LanguageType, str, float]]:
+        """
+        Rank POIs by the similarity of their best matching name with the query
+
+        :param query:
+        :param limit:
+        :param min_similarity: lowest trigram similarity, shared / (query + name - shared), kept
+        :param lang: only match names in this language
+        :return: (poi_id, lang, name, similarity) tuples, most similar first
+        """
+        grams = trigrams(query)
+        if not grams:
+            return []
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        best: dict[int, tuple[float, int]] = {}
+        for entry, count in shared.items():
+            if lang is not None and self._langs[entry] != lang:
+                continue
+            similarity = count / (len(grams) + self._sizes[entry] - count)
+            if similarity < min_similarity:
+                continue
+            poi_id = self._pois[entry]
+            if similarity > best.get(poi_id, (0.0, 0))[0]:
+                best[poi_id] = (similarity, entry)
+
+        ranked = heapq.nlargest(limit, best.values())
+        return [(self._pois[entry], self._langs[entry], self._names[entry], similarity) for similarity, entry in ranked]
@@ -0,0 +1,97 @@
+import asyncio
+
+from typing import Awaitable, Callable
+
+from src.common.log import log
+from src.database.db_redis import redis_client
+
+Handler = Callable[[str], Awaitable[None]]
+
+
+class RedisSubscriber:
+    """
+    Per-worker redis pub/sub listener dispatching channel messages to registered handlers
+
+    Messages are only delivered while the worker is connected, handlers must tolerate missed and
+    duplicated messages. Each handler call runs in its own task so a slow one does not hold back the
+    messages of other channels, handlers must also tolerate running concurrently with themselves
+    """
+
+    # Seconds to wait before reconnecting after the connection is lost
+    retry_delay: float = 1.0
+    # Seconds a read waits for a message, overriding the socket timeout of the client so an idle
+    # channel is not mistaken for a lost connection
+    poll_timeout: float = 30.0
+
+    def __init__(self):
+        self._handlers: dict[str, list[Handler]] = {}
+        self._task: asyncio.Task | None = None
+        # Handler calls still running, kept referenced until done and cancelled on stop
+        self._calls: set[asyncio.Task] = set()
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        """
+        Register a handler for a channel, must be called before start
+
+        :param channel:
+        :param handler: coroutine called with the message payload
+        :return:
+        """
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def publish(self, channel: str, message: str | int) -> int:
+        """
+        Publish a message to every worker subscribed to a channel, this one included
+
+        :param channel:
+        :param message:
+        :return: number of workers that received the message
+        """
+        return await redis_client.publish(channel, message)
+
+    async def start(self) -> None:
+        if self._handlers and self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for call in self._calls:
+            call.cancel()
+        await asyncio.gather(*self._calls, return_exceptions=True)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(*self._handlers)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=self.poll_timeout)
+                    if message is None:
+                        continue
+                    for handler in self._handlers.get(message['channel'], ()):
+                        call = asyncio.create_task(self._call(handler, message['channel'], message['data']))
+                        self._calls.add(call)
+                        call.add_done_callback(self._calls.discard)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f'Pub/sub connection lost, reconnecting: {e}')
+                await asyncio.sleep(self.retry_delay)
+            finally:
+                await pubsub.aclose()
+
+    @staticmethod
+    async def _call(handler: Handler, channel: str, data: str) -> None:
+        try:
+            await handler(data)
+        except Exception as e:
+            log.error(f'Pub/sub handler for {channel} failed: {e}')
+
+
+redis_subscriber = RedisSubscriber()
@@ -1,3 +1,5 @@
+import json
+
 from datetime import datetime
 from typing import Generic, TypeVar
 
@@ -99,5 +101,29 @@ class ResponseBase:
             content={"code": res.code, "msg": res.msg, "data": data},
         )
 
+    @staticmethod
+    def raw_success(
+        *,
+        res: CustomResponseCode | CustomResponse = CustomResponseCode.HTTP_200,
+        data: bytes = b"null",
+    ) -> Response:
+        """
+        Wrap already serialized JSON data in the unified response body, skipping pydantic entirely
+
+        .. warning::
+
+            ``data`` is written to the response as is, it must be valid JSON
+
+        :param res:
+        :param data: JSON encoded data
+        :return:
+        """
+        content = b'{"code":%d,"msg":%s,"data":%s}' % (
+            res.code,
+            json.dumps(res.msg, ensure_ascii=False).encode(),
+            data,
+        )
+        return Response(status_code=res.code, content=content, media_type="application/json")
+
 
 response_base: ResponseBase = ResponseBase()
@@ -1,9 +1,13 @@
+import hashlib
+import time
+
 from datetime import timedelta
+from functools import partial
+from typing import Any
 
 from fastapi import Depends, Request
 from fastapi.security import HTTPBearer
 from fastapi.security.utils import get_authorization_scheme_param
-from jose import ExpiredSignatureError, JWTError, jwt
 from pwdlib import PasswordHash
 from pwdlib.hashers.bcrypt import BcryptHasher
 from pydantic_core import from_json
@@ -12,37 +16,72 @@ from src.app.system.models.user import User
 from src.app.system.schema.user import CurrentUserIns
 from src.common.dataclasses import AccessToken, NewToken, RefreshToken
 from src.common.exception.errors import AuthorizationError, TokenError
+from src.common.pubsub import redis_subscriber
+from src.common.security.jwt_codec import JwtCodec
+from src.common.security.session import TokenKind, session_store
 from src.core.conf import settings
 from src.database.db_postgres import DBSession, async_db_session
-from src.database.db_redis import redis_client
+from src.utils.bounded_executor import BoundedExecutor
+from src.utils.import_parse import dynamic_import
 from src.utils.timezone import timezone
+from src.utils.ttl_cache import TTLCache
 
 # JWT authorizes dependency injection
 DependsJwtAuth = Depends(HTTPBearer())
 
 password_hash = PasswordHash((BcryptHasher(),))
 
+# bcrypt releases the GIL, hashing on threads keeps the event loop free during login storms
+password_executor = BoundedExecutor(
+    name="password-hash",
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+# Signs and verifies tokens, see src/common/security/jwt_codec.py
+token_codec: JwtCodec = dynamic_import(settings.TOKEN_CODEC)(
+    settings.TOKEN_SECRET_KEY, settings.TOKEN_ALGORITHM
+)
+
+# Claims of recently decoded tokens keyed by token digest, each expiring with its token
+decoded_token_cache: TTLCache[bytes, dict[str, Any]] = TTLCache(
+    max_size=settings.TOKEN_DECODE_CACHE_MAX_SIZE, ttl=settings.TOKEN_EXPIRE_SECONDS
+)
+
+# Users of recently authenticated tokens, lets repeat requests skip redis entirely
+token_user_cache: TTLCache[str, CurrentUserIns] = TTLCache(
+    max_size=settings.JWT_USER_CACHE_MAX_SIZE, ttl=settings.JWT_USER_CACHE_EXPIRE_SECONDS
+)
 
-def get_hash_password(password: str, salt: bytes | None) -> str:
+# Token epoch of recently seen users, kept current by the epoch broadcasts
+user_epoch_cache: TTLCache[int, int] = TTLCache(
+    max_size=settings.TOKEN_EPOCH_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_EPOCH_CACHE_EXPIRE_SECONDS,
+)
+
+
+async def get_hash_password(password: str, salt: bytes | None) -> str:
     """
-    Encrypt passwords using the hash algorithm
+    Encrypt passwords using the hash algorithm, on the password hashing threads
 
     :param password:
     :param salt:
     :return:
     """
-    return password_hash.hash(password, salt=salt)
+    return await password_executor.run(partial(password_hash.hash, password, salt=salt))
 
 
-def password_verify(plain_password: str, hashed_password: str) -> bool:
+async def password_verify(plain_password: str, hashed_password: str) -> bool:
     """
-    Password verification
+    Password verification, on the password hashing threads
 
     :param plain_password: The password to verify
     :param hashed_password: The hash ciphers to compare
     :return:
     """
-    return password_hash.verify(plain_password, hashed_password)
+    return await password_executor.run(
+        password_hash.verify, plain_password, hashed_password
+    )
 
 
 async def create_access_token(sub: str, multi_login: bool) -> AccessToken:
@@ -54,19 +93,25 @@ async def create_access_token(sub: str, multi_login: bool) -> AccessToken:
     :return:
     """
     expire = timezone.now() + timedelta(seconds=settings.TOKEN_EXPIRE_SECONDS)
-    expire_seconds = settings.TOKEN_EXPIRE_SECONDS
 
-    to_encode = {"exp": expire, "sub": sub}
-    access_token = jwt.encode(
-        to_encode, settings.TOKEN_SECRET_KEY, settings.TOKEN_ALGORITHM
+    if multi_login is False:
+        # Single login, previously issued access tokens stop passing the epoch check
+        epoch = await bump_user_epoch(int(sub))
+    else:
+        # Read from redis, the cached epoch may lag behind a bump this worker missed
+        epoch = await session_store.get_epoch(int(sub))
+    to_encode = {"exp": int(expire.timestamp()), "sub": sub, "epoch": epoch}
+    access_token = token_codec.encode(to_encode)
+
+    await session_store.add_token(
+        sub,
+        TokenKind.ACCESS,
+        access_token,
+        expire_time=expire,
+        exclusive=not multi_login,
     )
-
     if multi_login is False:
-        key_prefix = f"{settings.TOKEN_REDIS_PREFIX}:{sub}"
-        await redis_client.delete_prefix(key_prefix)
-
-    key = f"{settings.TOKEN_REDIS_PREFIX}:{sub}:{access_token}"
-    await redis_client.setex(key, expire_seconds, access_token)
+        await invalidate_user_cache(int(sub))
     return AccessToken(access_token=access_token, access_token_expire_time=expire)
 
 
@@ -79,19 +124,17 @@ async def create_refresh_token(sub: str, multi_login: bool) -> RefreshToken:
     :return:
     """
     expire = timezone.now() + timedelta(seconds=settings.TOKEN_REFRESH_EXPIRE_SECONDS)
-    expire_seconds = settings.TOKEN_REFRESH_EXPIRE_SECONDS
 
-    to_encode = {"exp": expire, "sub": sub}
-    refresh_token = jwt.encode(
-        to_encode, settings.TOKEN_SECRET_KEY, settings.TOKEN_ALGORITHM
-    )
-
-    if multi_login is False:
-        key_prefix = f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{sub}"
-        await redis_client.delete_prefix(key_prefix)
+    to_encode = {"exp": int(expire.timestamp()), "sub": sub}
+    refresh_token = token_codec.encode(to_encode)
 
-    key = f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{sub}:{refresh_token}"
-    await redis_client.setex(key, expire_seconds, refresh_token)
+    await session_store.add_token(
+        sub,
+        TokenKind.REFRESH,
+        refresh_token,
+        expire_time=expire,
+        exclusive=not multi_login,
+    )
     return RefreshToken(refresh_token=refresh_token, refresh_token_expire_time=expire)
 
 
@@ -107,19 +150,14 @@ async def create_new_token(
     :param multi_login:
     :return:
     """
-    redis_refresh_token = await redis_client.get(
-        f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{sub}:{refresh_token}"
-    )
-    if not redis_refresh_token or redis_refresh_token != refresh_token:
+    if not await session_store.has_refresh(sub, refresh_token):
         raise TokenError(msg="Refresh Token has expired")
 
     new_access_token = await create_access_token(sub, multi_login)
     new_refresh_token = await create_refresh_token(sub, multi_login)
 
-    token_key = f"{settings.TOKEN_REDIS_PREFIX}:{sub}:{token}"
-    refresh_token_key = f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{sub}:{refresh_token}"
-    await redis_client.delete(token_key)
-    await redis_client.delete(refresh_token_key)
+    await session_store.revoke(sub, access_token=token, refresh_token=refresh_token)
+    await invalidate_user_cache(int(sub))
     return NewToken(
         new_access_token=new_access_token.access_token,
         new_access_token_expire_time=new_access_token.access_token_expire_time,
@@ -148,18 +186,33 @@ def jwt_decode(token: str) -> int:
     :param token:
     :return:
     """
+    return int(jwt_decode_payload(token)["sub"])
+
+
+def jwt_decode_payload(token: str) -> dict[str, Any]:
+    """
+    Decode and verify token, claims of tokens already seen are reused until they expire
+
+    :param token:
+    :return: claims, with a valid user id as sub
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = decoded_token_cache.get(key)
+    if payload is not None:
+        return payload
     try:
-        payload = jwt.decode(
-            token, settings.TOKEN_SECRET_KEY, algorithms=[settings.TOKEN_ALGORITHM]
-        )
+        payload = token_codec.decode(token)
         user_id = int(payload.get("sub", 0))
         if not user_id:
             raise TokenError(msg="Invalid Token")
-    except ExpiredSignatureError:
-        raise TokenError(msg="Token has expired")
-    except (JWTError, Exception):
+    except TokenError:
+        raise
+    except Exception:
         raise TokenError(msg="Invalid Token")
-    return user_id
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        decoded_token_cache.set(key, payload, ttl=exp - time.time())
+    return payload
 
 
 async def get_current_user(db: DBSession, pk: int) -> User:
@@ -197,22 +250,104 @@ def superuser_verify(request: Request) -> bool:
     return superuser
 
 
+async def invalidate_user_cache(user_id: int) -> None:
+    """
+    Drop the cached tokens of a user on every worker, to be called whenever its tokens or user data change
+
+    :param user_id:
+    :return:
+    """
+    token_user_cache.discard(lambda _, user: user.id == user_id)
+    await redis_subscriber.publish(settings.JWT_USER_INVALIDATE_CHANNEL, user_id)
+
+
+async def on_user_invalidated(message: str) -> None:
+    """Handle an invalidation broadcast by invalidate_user_cache"""
+    user_id = int(message)
+    token_user_cache.discard(lambda _, user: user.id == user_id)
+
+
+async def get_user_epoch(user_id: int) -> int:
+    """
+    Current token epoch of a user, from the local cache when possible, only for verifying tokens
+
+    :param user_id:
+    :return:
+    """
+    epoch = user_epoch_cache.get(user_id)
+    if epoch is None:
+        epoch = await session_store.get_epoch(user_id)
+        user_epoch_cache.set(user_id, epoch)
+    return epoch
+
+
+async def bump_user_epoch(user_id: int) -> int:
+    """
+    Revoke every access token issued so far to a user, on every worker
+
+    :param user_id:
+    :return: the new epoch
+    """
+    epoch = await session_store.bump_epoch(user_id)
+    user_epoch_cache.set(user_id, epoch)
+    await redis_subscriber.publish(settings.TOKEN_EPOCH_CHANNEL, f"{user_id}:{epoch}")
+    return epoch
+
+
+async def on_user_epoch(message: str) -> None:
+    """Handle an epoch broadcast by bump_user_epoch, epochs only move forward"""
+    user_id, epoch = map(int, message.split(":"))
+    current = user_epoch_cache.get(user_id)
+    if current is None or epoch > current:
+        user_epoch_cache.set(user_id, epoch)
+
+
+async def revoke_user_sessions(user_id: int) -> None:
+    """
+    Revoke every token of a user, stateful and stateless, and drop its cached data
+
+    :param user_id:
+    :return:
+    """
+    await session_store.delete(user_id)
+    await bump_user_epoch(user_id)
+    await invalidate_user_cache(user_id)
+
+
 async def jwt_authentication(token: str) -> CurrentUserIns:
     """
     JWT authentication
 
+    In stateless mode a token carrying the current epoch of its user is live without
+    asking redis, tokens without the claim still go through the session store
+
     :param token:
     :return:
     """
-    user_id = jwt_decode(token)
-    key = f"{settings.TOKEN_REDIS_PREFIX}:{user_id}:{token}"
-    token_verify = await redis_client.get(key)
-
-    if not token_verify:
-        raise TokenError(msg="Token has expired")
+    payload = jwt_decode_payload(token)
+    user_id = int(payload["sub"])
+    epoch = payload.get("epoch") if settings.TOKEN_STATELESS_ENABLED else None
+    if epoch is not None:
+        current = await get_user_epoch(user_id)
+        if epoch > current:
+            # Issued after the epoch this worker knows of, its broadcast may not have
+            # arrived yet
+            current = await session_store.get_epoch(user_id)
+            user_epoch_cache.set(user_id, current)
+        if epoch < current:
+            raise TokenError(msg="Token has been revoked")
+    user = token_user_cache.get(token)
+    if user is not None:
+        return user
+
+    if epoch is not None:
+        cache_user = await session_store.get_user(user_id)
+    else:
+        # Token liveness and cached user in a single round trip
+        token_verify, cache_user = await session_store.get_access(user_id, token)
 
-    cache_key = f"{settings.JWT_USER_REDIS_PREFIX}:{user_id}"
-    cache_user = await redis_client.get(cache_key)
+        if not token_verify:
+            raise TokenError(msg="Token has expired")
 
     if not cache_user:
         # No cache, fetch from DB and create new cache
@@ -221,14 +356,11 @@ async def jwt_authentication(token: str) -> CurrentUserIns:
             user_data = current_user.model_dump()
             user = CurrentUserIns(**user_data)
             # Cache the user data
-            await redis_client.setex(
-                cache_key,
-                settings.JWT_USER_REDIS_EXPIRE_SECONDS,
-                user.model_dump_json(),
-            )
+            await session_store.set_user(user_id, user.model_dump_json())
     else:
         # Use cached data
         user_data = from_json(cache_user, allow_partial=True)
         user = CurrentUserIns.model_validate(user_data)
 
+    token_user_cache.set(token, user)
     return user
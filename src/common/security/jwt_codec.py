@@ -0,0 +1,53 @@
+from abc import ABC, abstractmethod
+from typing import Any
+
+from jose import ExpiredSignatureError, JWTError, jwt
+
+from src.common.exception.errors import TokenError
+
+
+class JwtCodec(ABC):
+    """
+    Signs and verifies tokens for src.common.security.jwt, selected by the TOKEN_CODEC setting
+
+    Implementations wrap a JWT library so alternatives can be swapped in and benchmarked without touching
+    callers. They are built with the secret key and algorithm and must raise TokenError, never a library
+    exception
+    """
+
+    def __init__(self, secret_key: str, algorithm: str):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+
+    @abstractmethod
+    def encode(self, claims: dict[str, Any]) -> str:
+        """
+        Sign claims into a token
+
+        :param claims: JSON-serializable claims, exp as a unix timestamp
+        :return:
+        """
+
+    @abstractmethod
+    def decode(self, token: str) -> dict[str, Any]:
+        """
+        Verify a token and return its claims
+
+        :param token:
+        :return:
+        """
+
+
+class JoseCodec(JwtCodec):
+    """python-jose, the default codec"""
+
+    def encode(self, claims: dict[str, Any]) -> str:
+        return jwt.encode(claims, self.secret_key, self.algorithm)
+
+    def decode(self, token: str) -> dict[str, Any]:
+        try:
+            return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except ExpiredSignatureError:
+            raise TokenError(msg='Token has expired')
+        except JWTError:
+            raise TokenError(msg='Invalid Token')
@@ -0,0 +1,180 @@
+import hashlib
+import time
+
+from datetime import datetime
+from enum import Enum
+
+from redis.exceptions import WatchError
+
+from src.core.conf import settings
+from src.database.db_redis import redis_client
+
+
+class TokenKind(str, Enum):
+    ACCESS = 'at'
+    REFRESH = 'rt'
+
+
+# Field of the session hash holding the serialized CurrentUserIns
+USER_FIELD = 'user'
+
+
+class SessionStore:
+    """
+    Redis session store with one hash per user
+
+    Fields are ``at:{fingerprint}`` and ``rt:{fingerprint}`` mapped to the unix expiry of an access or refresh
+    token, plus ``user`` holding the serialized user. The hash expires with its last token, so revoking every
+    session of a user is a single DEL and authenticating a request a single HMGET
+    """
+
+    @staticmethod
+    def key(user_id: int | str) -> str:
+        return f'{settings.TOKEN_SESSION_REDIS_PREFIX}:{user_id}'
+
+    @staticmethod
+    def field(kind: TokenKind, token: str) -> str:
+        """Hash field of a token, a fingerprint so the token itself is never stored"""
+        return f'{kind.value}:{hashlib.sha256(token.encode()).hexdigest()[:32]}'
+
+    async def add_token(
+        self, user_id: int | str, kind: TokenKind, token: str, expire_time: datetime, exclusive: bool = False
+    ) -> None:
+        """
+        Register a token, pruning the expired ones of the user
+
+        :param user_id:
+        :param kind:
+        :param token:
+        :param expire_time:
+        :param exclusive: revoke the other tokens of this kind, for users without multi-login
+        :return:
+        """
+        key = self.key(user_id)
+        expires = int(expire_time.timestamp())
+        async with redis_client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    # Concurrent sign-ins retry on each other's writes, so an exclusive one never misses a token
+                    await pipe.watch(key)
+                    now = int(time.time())
+                    stale = []
+                    key_expires = expires
+                    for name, value in (await pipe.hgetall(key)).items():
+                        if name == USER_FIELD:
+                            continue
+                        if int(value) <= now or (exclusive and name.startswith(f'{kind.value}:')):
+                            stale.append(name)
+                        else:
+                            key_expires = max(key_expires, int(value))
+                    pipe.multi()
+                    if stale:
+                        pipe.hdel(key, *stale)
+                    pipe.hset(key, self.field(kind, token), expires)
+                    pipe.expireat(key, key_expires)
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    async def get_access(self, user_id: int | str, token: str) -> tuple[bool, str | None]:
+        """
+        Check an access token and read the cached user in one round trip
+
+        :param user_id:
+        :param token:
+        :return: whether the token is live, the serialized user when cached
+        """
+        expires, user = await redis_client.hmget(self.key(user_id), [self.field(TokenKind.ACCESS, token), USER_FIELD])
+        return expires is not None and int(expires) > time.time(), user
+
+    async def get_user(self, user_id: int | str) -> str | None:
+        return await redis_client.hget(self.key(user_id), USER_FIELD)
+
+    async def has_refresh(self, user_id: int | str, token: str) -> bool:
+        expires = await redis_client.hget(self.key(user_id), self.field(TokenKind.REFRESH, token))
+        return expires is not None and int(expires) > time.time()
+
+    async def set_user(self, user_id: int | str, user: str) -> None:
+        """
+        Cache the serialized user, only while the user has a session
+
+        :param user_id:
+        :param user:
+        :return:
+        """
+        key = self.key(user_id)
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.exists(key)
+            pipe.hset(key, USER_FIELD, user)
+            existed, _ = await pipe.execute()
+        if not existed:
+            # Revoked meanwhile, do not leave a hash without expiry behind
+            await redis_client.delete(key)
+
+    async def clear_user(self, user_id: int | str) -> None:
+        await redis_client.hdel(self.key(user_id), USER_FIELD)
+
+    async def revoke(
+        self, user_id: int | str, access_token: str | None = None, refresh_token: str | None = None
+    ) -> None:
+        """
+        Revoke single tokens of a user
+
+        :param user_id:
+        :param access_token:
+        :param refresh_token:
+        :return:
+        """
+        fields = []
+        if access_token:
+            fields.append(self.field(TokenKind.ACCESS, access_token))
+        if refresh_token:
+            fields.append(self.field(TokenKind.REFRESH, refresh_token))
+        if fields:
+            await redis_client.hdel(self.key(user_id), *fields)
+
+    async def revoke_others(self, user_id: int | str, access_token: str, refresh_token: str | None = None) -> None:
+        """
+        Revoke every token of a user except the given ones
+
+        :param user_id:
+        :param access_token: access token to keep
+        :param refresh_token: refresh token to keep, every refresh token is kept when None
+        :return:
+        """
+        key = self.key(user_id)
+        keep = {USER_FIELD, self.field(TokenKind.ACCESS, access_token)}
+        if refresh_token:
+            keep.add(self.field(TokenKind.REFRESH, refresh_token))
+        stale = [
+            name
+            for name in await redis_client.hkeys(key)
+            if name not in keep and (refresh_token or not name.startswith(f'{TokenKind.REFRESH.value}:'))
+        ]
+        if stale:
+            await redis_client.hdel(key, *stale)
+
+    @staticmethod
+    def epoch_key(user_id: int | str) -> str:
+        return f'{settings.TOKEN_EPOCH_REDIS_PREFIX}:{user_id}'
+
+    async def get_epoch(self, user_id: int | str) -> int:
+        """Current token epoch of a user, access tokens carrying an older one are revoked"""
+        return int(await redis_client.get(self.epoch_key(user_id)) or 0)
+
+    async def bump_epoch(self, user_id: int | str) -> int:
+        """
+        Revoke every access token of a user issued so far, kept apart from the session hash so it outlives it
+
+        :param user_id:
+        :return: the new epoch
+        """
+        return await redis_client.incr(self.epoch_key(user_id))
+
+    async def delete(self, user_id: int | str) -> None:
+        """Revoke every token of a user and drop its cached data"""
+        await redis_client.delete(self.key(user_id))
+
+
+session_store: SessionStore = SessionStore()
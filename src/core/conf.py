@@ -73,17 +73,28 @@ class Settings(BaseSettings):
     # Token
     TOKEN_SECRET_KEY: str
     TOKEN_ALGORITHM: str = 'HS256'  # algorithm
+    TOKEN_CODEC: str = 'src.common.security.jwt_codec.JoseCodec'  # JwtCodec implementation signing tokens
+    TOKEN_DECODE_CACHE_MAX_SIZE: int = 10000  # decoded tokens cached per worker, 0 disables the cache
     TOKEN_EXPIRE_SECONDS: int = 60 * 60 * 24 * 1  # 1 day
     TOKEN_REFRESH_EXPIRE_SECONDS: int = 60 * 60 * 24 * 7  # refresh token expiration time in seconds
-    TOKEN_REDIS_PREFIX: str = 'fba:token'
-    TOKEN_REFRESH_REDIS_PREFIX: str = 'fba:refresh_token'
+    TOKEN_SESSION_REDIS_PREFIX: str = 'fba:session'  # one hash per user: token fingerprints and cached user
+    TOKEN_STATELESS_ENABLED: bool = False  # check access tokens by their epoch claim instead of the session store
+    TOKEN_EPOCH_REDIS_PREFIX: str = 'fba:token_epoch'  # per-user epoch, bumped when all its sessions are revoked
+    TOKEN_EPOCH_CHANNEL: str = 'fba:token_epoch'  # pub/sub channel of `uid:epoch` bumps
+    TOKEN_EPOCH_CACHE_MAX_SIZE: int = 100000  # user epochs cached per worker
+    TOKEN_EPOCH_CACHE_EXPIRE_SECONDS: int = 60  # bounds staleness when a bump broadcast is missed
     TOKEN_REQUEST_PATH_EXCLUDE: list[str] = [  # JWT / RBAC whitelist
         f'{FASTAPI_API_V1_PATH}/auth/login',
     ]
 
     # JWT
-    JWT_USER_REDIS_PREFIX: str = 'fba:user'
-    JWT_USER_REDIS_EXPIRE_SECONDS: int = 60 * 60 * 24 * 7  # 7 days
+    JWT_USER_CACHE_MAX_SIZE: int = 10000  # authenticated tokens cached per worker, 0 disables the cache
+    JWT_USER_CACHE_EXPIRE_SECONDS: int = 60  # bounds staleness when an invalidation broadcast is missed
+    JWT_USER_INVALIDATE_CHANNEL: str = 'fba:jwt:invalidate'  # pub/sub channel of user ids to drop from the cache
+
+    # Password hashing
+    PASSWORD_HASH_WORKERS: int = 4  # threads hashing passwords per worker
+    PASSWORD_HASH_MAX_PENDING: int = 64  # hashes queued or running per worker before answering 503
 
     # Cookies
     COOKIE_REFRESH_TOKEN_KEY: str = 'fba_refresh_token'
@@ -106,6 +117,34 @@ class Settings(BaseSettings):
     LOG_STDOUT_FILENAME: str = 'fba_access.log'
     LOG_STDERR_FILENAME: str = 'fba_error.log'
 
+    # Hunt
+    HUNT_HINTS_INDEX_ENABLED: bool = True  # serve /hunt/hints from an in-memory index loaded at startup
+    HUNT_HINTS_SNAPSHOT_ENABLED: bool = True  # map the index from the snapshot file instead of loading the table
+    HUNT_HINTS_DEFAULT_DISTANCE: int = 10  # cells searched when a lookup sets no max_distance
+    HUNT_HINTS_MAX_DISTANCE: int = 50  # upper bound for a lookup max_distance
+    HUNT_HINTS_BATCH_MAX_SIZE: int = 100  # max lookups per /hunt/hints/batch request
+    HUNT_HINTS_ANSWERS_ENABLED: bool = False  # serve /hunt/hints from answers precomputed by `seed --answers`
+    HUNT_HINTS_OCCUPANCY_ENABLED: bool = True  # skip queries for empty rows, columns and off-map cells
+    HUNT_HINTS_REDIS_PREFIX: str = 'fba:hunt:hints'
+    HUNT_HINTS_REDIS_EXPIRE_SECONDS: int = 60 * 60 * 24  # 1 day
+    HUNT_DATASET_VERSION_REDIS_KEY: str = 'fba:hunt:dataset_version'  # bumped on every reseed
+    HUNT_HINTS_CACHE_CONTROL: str = 'public, max-age=3600'  # GET /hunt/hints, revalidated through ETag
+    HUNT_POIS_CACHE_CONTROL: str = 'public, max-age=86400'  # GET /hunt/pois, revalidated through ETag
+    HUNT_HINTS_EXPORT_BATCH_SIZE: int = 5000  # rows fetched per round trip by the export cursor
+    HUNT_HINTS_EXPORT_GZIP_LEVEL: int = 6
+    HUNT_SEED_BATCH_SIZE: int = 10000  # hints sent per COPY by `seed --hints`
+    HUNT_SEARCH_MAX_LIMIT: int = 50  # max POIs returned by /hunt/search
+    HUNT_SEARCH_MIN_SIMILARITY: float = 0.3  # trigram similarity below which POIs are not returned
+    HUNT_TILE_SIZE: int = 32  # cells per side of a /hunt/tiles tile
+    HUNT_TILES_CACHE_MAX_SIZE: int = 4096  # encoded tiles kept per worker for the current dataset version
+    HUNT_RELOAD_CHANNEL: str = 'fba:hunt:reload'  # pub/sub channel telling workers to reload the dataset
+
+    # Warm-up
+    WARMUP_ENABLED: bool = True  # warm a worker up before GET /health/ready reports it ready
+    WARMUP_POSTGRES_CONNECTIONS: int = 5  # pooled connections opened up front
+    WARMUP_REDIS_CONNECTIONS: int = 5  # pooled connections opened up front
+    WARMUP_HOT_CELLS: list[tuple[int, int]] = []  # cells whose lookups and tile are loaded up front
+
     # Super Admin
     SUPER_ADMIN_EMAIL: str
     SUPER_ADMIN_USERNAME: str
@@ -1,3 +1,5 @@
+import asyncio
+
 from contextlib import asynccontextmanager
 
 from asgi_correlation_id import CorrelationIdMiddleware
@@ -6,8 +8,12 @@ from fastapi_limiter import FastAPILimiter
 from starlette.middleware.authentication import AuthenticationMiddleware
 
 from src.app.router import route
+from src.app.system.service.hunt_service import HuntService
 from src.common.exception.exception_handler import register_exception
+from src.common.pubsub import redis_subscriber
+from src.common.security.jwt import on_user_epoch, on_user_invalidated, password_executor
 from src.core.conf import settings
+from src.core.warmup import warm_up
 from src.database.db_postgres import create_db_and_tables
 from src.database.db_redis import redis_client
 from src.middleware.jwt_auth_middleware import JwtAuthMiddleware
@@ -22,19 +28,44 @@ async def init_handler(app: FastAPI):
 
     # Connect to redis
     await redis_client.open()
+    # Load hint index, a snapshot is only used when it matches the dataset version in redis
+    if settings.HUNT_HINTS_INDEX_ENABLED:
+        await HuntService.load_index()
+    if settings.HUNT_HINTS_ANSWERS_ENABLED:
+        await HuntService.load_answers()
+    if settings.HUNT_HINTS_OCCUPANCY_ENABLED:
+        await HuntService.load_occupancy()
+    await HuntService.load_search_index()
+    # Listen for dataset reloads broadcast by POST /hunt/reload
+    redis_subscriber.subscribe(settings.HUNT_RELOAD_CHANNEL, HuntService.on_reload)
+    # Drop cached tokens of users whose tokens or data changed on any worker
+    redis_subscriber.subscribe(settings.JWT_USER_INVALIDATE_CHANNEL, on_user_invalidated)
+    # Keep the token epochs of stateless authentication current
+    redis_subscriber.subscribe(settings.TOKEN_EPOCH_CHANNEL, on_user_epoch)
+    await redis_subscriber.start()
     # Initialize limiter
     await FastAPILimiter.init(
         redis=redis_client,
         prefix=settings.REQUEST_LIMITER_REDIS_PREFIX,
         http_callback=http_limit_callback,
     )
+    # Warm up in the background, GET /health/ready answers 503 until it is done
+    app.state.ready = not settings.WARMUP_ENABLED
+    warm_up_task = asyncio.create_task(warm_up(app)) if settings.WARMUP_ENABLED else None
 
     yield
 
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+
+    # Stop listening before the redis connection goes away
+    await redis_subscriber.stop()
     # Close redis connection
     await redis_client.close()
     # Close limiter
     await FastAPILimiter.close()
+    # Stop password hashing threads
+    password_executor.shutdown()
 
 
 def register_app():
@@ -8,3 +8,11 @@ BasePath = Path(__file__).resolve().parent.parent.parent
 
 
 LOG_DIR = os.path.join(BasePath, "log")
+
+DATA_DIR = os.path.join(BasePath, "data")
+
+# Memory-mapped precomputed hint answers, written by `seed --answers`
+HINT_ANSWERS_FILE = os.path.join(DATA_DIR, "hint_answers.bin")
+
+# Memory-mapped hint index snapshot, written by `seed --hints` and `seed --snapshot`
+HINT_SNAPSHOT_FILE = os.path.join(DATA_DIR, "hint_snapshot.bin")
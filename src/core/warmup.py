@@ -0,0 +1,64 @@
+import time
+
+from contextlib import AsyncExitStack
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from sqlalchemy import text
+
+from src.app.system.service.hunt_service import HuntService
+from src.common.log import log
+from src.core.conf import settings
+from src.database.db_postgres import async_engine
+from src.database.db_redis import redis_client
+
+
+async def warm_up(app: FastAPI) -> None:
+    """
+    Pay the cold costs of a fresh worker, then mark it ready
+
+    A failing step is logged and skipped, the worker then warms up on its first requests instead
+
+    :param app:
+    :return:
+    """
+    start = time.perf_counter()
+    steps = (
+        ('postgres connections', open_postgres_connections),
+        ('redis connections', open_redis_connections),
+        ('response models', lambda: build_response_models(app)),
+        ('hot hint cells', lambda: HuntService.warm_up(settings.WARMUP_HOT_CELLS)),
+    )
+    for name, step in steps:
+        try:
+            await step()
+        except Exception as e:
+            log.warning(f'Warm-up of {name} failed: {e}')
+    app.state.ready = True
+    log.info(f'Warm-up finished in {time.perf_counter() - start:.2f}s')
+
+
+async def open_postgres_connections() -> None:
+    """Fill the pool with connections held at the same time, released ones stay pooled up to the pool size"""
+    async with AsyncExitStack() as stack:
+        for _ in range(settings.WARMUP_POSTGRES_CONNECTIONS):
+            conn = await stack.enter_async_context(async_engine.connect())
+            await conn.execute(text('SELECT 1'))
+
+
+async def open_redis_connections() -> None:
+    pool = redis_client.connection_pool
+    connections = [await pool.get_connection('PING') for _ in range(settings.WARMUP_REDIS_CONNECTIONS)]
+    for connection in connections:
+        await pool.release(connection)
+
+
+async def build_response_models(app: FastAPI) -> None:
+    """Generate the OpenAPI schema and run every route's response model through validation and serialization"""
+    app.openapi()
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.response_field is not None:
+            # ResponseModel fields all have defaults, other response types are skipped on errors
+            value, errors = route.response_field.validate({}, {}, loc=('response',))
+            if not errors:
+                route.response_field.serialize(value, mode='json')
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from src.common.exception import errors
+
+T = TypeVar('T')
+
+
+class BoundedExecutor:
+    """
+    Thread pool for blocking CPU-bound calls with a cap on queued work
+
+    Calls beyond max_pending are rejected with 503 instead of queueing up behind a backlog that would time
+    out anyway. Latency is tracked per call, split between time waiting for a thread and time running
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        """
+        :param name: thread name prefix
+        :param max_workers: threads running calls
+        :param max_pending: calls queued or running before new ones are rejected
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.pending = 0
+        self.count = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self.max_run_seconds = 0.0
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Run a blocking call on the pool without blocking the event loop
+
+        :param fn:
+        :param args:
+        :return:
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise errors.HTTPError(code=503, msg='Server busy, please try again later', headers={'Retry-After': '1'})
+        self.pending += 1
+        submitted = time.perf_counter()
+        started = submitted
+
+        def call() -> T:
+            nonlocal started
+            started = time.perf_counter()
+            return fn(*args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, call)
+        finally:
+            finished = time.perf_counter()
+            self.pending -= 1
+            self.count += 1
+            self.wait_seconds += started - submitted
+            self.run_seconds += finished - started
+            self.max_run_seconds = max(self.max_run_seconds, finished - started)
+
+    def stats(self) -> dict[str, int | float]:
+        """Counters since startup, latencies in milliseconds"""
+        return {
+            'workers': self.max_workers,
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'count': self.count,
+            'rejected': self.rejected,
+            'avg_wait_ms': round(self.wait_seconds / self.count * 1000, 3) if self.count else 0.0,
+            'avg_run_ms': round(self.run_seconds / self.count * 1000, 3) if self.count else 0.0,
+            'max_run_ms': round(self.max_run_seconds * 1000, 3),
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,42 @@
+import hashlib
+
+from fastapi import Request, Response
+
+from src.common.response.response_code import StandardResponseCode
+
+
+def make_etag(*parts: object) -> str:
+    """
+    Build a strong ETag from the values that identify a representation
+
+    :param parts:
+    :return:
+    """
+    digest = hashlib.sha256(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check the request If-None-Match header against an ETag, using weak comparison as RFC 9110 requires
+
+    :param request:
+    :param etag:
+    :return:
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+def not_modified(headers: dict[str, str]) -> Response:
+    """
+    Empty 304 response, carrying the validator and caching headers of the full response
+
+    :param headers:
+    :return:
+    """
+    return Response(status_code=StandardResponseCode.HTTP_304, headers=headers)
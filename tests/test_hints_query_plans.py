@@ -0,0 +1,102 @@
+"""
+Query plans of the directional hint lookups, against the Postgres configured by the POSTGRES_* settings
+
+The tables are created and dropped again inside a rolled back transaction, sequential scans are disabled so
+the plans do not depend on how many rows the database holds
+"""
+
+import asyncio
+
+from typing import Any
+
+import pytest
+
+from pydantic import ValidationError
+
+try:
+    from src.core.conf import settings
+except ValidationError as e:
+    pytest.skip(f'Settings are not configured: {e}', allow_module_level=True)
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+
+from src.app.system.crud.crud_hints import hints_dao
+from src.database.db_postgres import POSTGRES_URL
+
+INDEX_SCANS = {'Index Scan', 'Index Only Scan', 'Bitmap Index Scan'}
+
+# Lookup method, its arguments and the index it must scan
+LOOKUPS = {
+    'right': (hints_dao.get_hints_right, {'y': 50, 'x': 50}, 'ix_hints_posY_posX'),
+    'left': (hints_dao.get_hints_left, {'y': 50, 'x': 50}, 'ix_hints_posY_posX'),
+    'up': (hints_dao.get_hints_up, {'x': 50, 'y': 50}, 'ix_hints_posX_posY'),
+    'down': (hints_dao.get_hints_down, {'x': 50, 'y': 50}, 'ix_hints_posX_posY'),
+}
+
+
+class _Captured(Exception):
+    pass
+
+
+class _CaptureSession:
+    """Stands in for the session of a lookup to get hold of the query it runs"""
+
+    query: Any = None
+
+    async def exec(self, query: Any) -> None:
+        self.query = query
+        raise _Captured
+
+
+async def _lookup_query(method: Any, kwargs: dict[str, int]) -> str:
+    session = _CaptureSession()
+    with pytest.raises(_Captured):
+        await method(session, **kwargs)
+    return str(session.query.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+
+async def _explain_lookups() -> dict[str, dict]:
+    engine = create_async_engine(POSTGRES_URL, connect_args={'timeout': 3})
+    try:
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                await conn.run_sync(SQLModel.metadata.create_all)
+                await conn.execute(text('SET LOCAL enable_seqscan = off'))
+                plans = {}
+                for name, (method, kwargs, _) in LOOKUPS.items():
+                    query = await _lookup_query(method, kwargs)
+                    result = await conn.execute(text(f'EXPLAIN (FORMAT JSON) {query}'))
+                    plans[name] = result.scalar_one()[0]['Plan']
+                return plans
+            finally:
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+
+def _index_scans(plan: dict) -> set[str]:
+    """Indexes scanned anywhere in a plan tree"""
+    scans = set()
+    if plan['Node Type'] in INDEX_SCANS:
+        scans.add(plan['Index Name'])
+    for child in plan.get('Plans', ()):
+        scans |= _index_scans(child)
+    return scans
+
+
+@pytest.fixture(scope='module')
+def plans() -> dict[str, dict]:
+    try:
+        return asyncio.run(_explain_lookups())
+    except (OSError, asyncio.TimeoutError) as e:
+        pytest.skip(f'Postgres is not reachable at {settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}: {e}')
+
+
+@pytest.mark.parametrize('name', LOOKUPS)
+def test_lookup_uses_its_index(plans: dict[str, dict], name: str) -> None:
+    *_, index = LOOKUPS[name]
+    assert index in _index_scans(plans[name]), plans[name]